@@ -0,0 +1,134 @@
+import argparse
+import heapq
+import itertools
+import math
+import random
+import time
+from collections import namedtuple
+
+# A* for set cover on bitmasks. Sets and coverage are Python ints (bit i = element i), so a union is an OR and a count is bit_count,
+# whatever the size of the universe. A state is its coverage: which sets led there does not change what is left to do,
+# so every coverage is expanded once (closed set) and remembers the set that first reached it with the fewest sets
+
+Solution = namedtuple("Solution", ["taken", "steps", "pushed"])
+
+def make_problem(problem_size: int, num_sets: int, density: float = 0.2, seed=None) -> list[int]:
+    '''Random sets as in the notebook, every element in every set with probability density'''
+    rng = random.Random(seed)
+    return [sum(1 << element for element in range(problem_size) if rng.random() < density) for _ in range(num_sets)]
+
+def from_arrays(sets) -> list[int]:
+    '''Bitmasks of sets given as boolean arrays, as SETS of the notebook'''
+    return [sum(1 << element for element, value in enumerate(array) if value) for array in sets]
+
+# Admissible and consistent heuristics: lower bounds on the sets still needed, from the missing elements and what each set would add (gains)
+
+def h1(missing: int, gains: list[int], sets: list[int]) -> int:
+    '''Missing elements over the largest gain, rounded up: no set adds more than that'''
+    missing_count = missing.bit_count()
+    return -(-missing_count // max(gains)) if missing_count else 0
+
+def h2(missing: int, gains: list[int], sets: list[int]) -> int:
+    '''Fewest sets whose gains add up to the missing elements: a cover needs at least as many'''
+    missing_count = missing.bit_count()
+    total = 0
+    for needed, gain in enumerate(sorted(gains, reverse=True)):
+        if total >= missing_count:
+            return needed
+        total += gain
+    return len(gains)
+
+def h3(missing: int, gains: list[int], sets: list[int]) -> int:
+    '''
+    Every missing element costs 1 / the largest gain of a set containing it. A set of the cover pays at most 1 for the elements it adds,
+    so the cover has at least as many sets as the total, rounded up
+    '''
+    # by decreasing gain, the first set containing an element has its largest gain
+    charged, total = 0, 0.0
+    for gain, mask in sorted(zip(gains, sets), reverse=True):
+        if gain == 0 or charged == missing:
+            break
+        new = mask & missing & ~charged
+        total += new.bit_count() / gain
+        charged |= new
+    return math.ceil(total - 1e-9)
+
+def h4(missing: int, gains: list[int], sets: list[int]) -> int:
+    '''The largest of h2 and h3'''
+    return max(h2(missing, gains, sets), h3(missing, gains, sets))
+
+HEURISTICS = {"h1": h1, "h2": h2, "h3": h3, "h4": h4}
+
+def solve(sets: list[int], problem_size: int, heuristic: str = "h4", weight: float = 1) -> Solution:
+    '''
+    Fewest sets covering the universe of problem_size elements. Every heuristic is consistent, so an expanded coverage is never
+    reached again with fewer sets and needs no reopening. Ties go to the state with more sets, then to the one with fewer missing elements.
+    With weight w > 1 the priority is g + w * h (weighted A*): far fewer states, and a cover at most w times larger than the smallest.
+    With an infinite weight the priority is h alone (greedy best-first): no bound on the cover, but universes of thousands of elements
+    '''
+    estimate = HEURISTICS[heuristic]
+    greedy = math.isinf(weight)
+    universe = (1 << problem_size) - 1
+    # sets containing every element, the elements with fewest sets first
+    containing = [[index for index, mask in enumerate(sets) if mask >> element & 1] for element in range(problem_size)]
+    if not all(containing):
+        raise ValueError("the sets do not cover the universe")
+    rarest_first = sorted(range(problem_size), key=lambda element: len(containing[element]))
+    counter = itertools.count()
+    # coverage -> (sets taken, parent coverage, set added), the path back to the empty coverage
+    reached = {0: (0, None, None)}
+    closed = set()
+    # (f, -g, missing elements, tie breaker, coverage)
+    frontier = [(0, 0, problem_size, next(counter), 0)]
+    steps = 0
+    while frontier:
+        _, negative_g, _, _, coverage = heapq.heappop(frontier)
+        g = -negative_g
+        if coverage in closed or reached[coverage][0] < g:
+            continue
+        if coverage == universe:
+            taken = []
+            while reached[coverage][1] is not None:
+                _, parent, index = reached[coverage]
+                taken.append(index)
+                coverage = parent
+            return Solution(tuple(reversed(taken)), steps, next(counter) - 1)
+        closed.add(coverage)
+        steps += 1
+        missing = universe & ~coverage
+        # every cover contains a set with the rarest missing element: those are the only moves to try
+        element = next(element for element in rarest_first if missing >> element & 1)
+        additions = {}
+        for index in containing[element]:
+            additions.setdefault(sets[index] & missing, index)
+        for added, index in additions.items():
+            # a set adding a part of what another one adds leads nowhere the other does not
+            if any(added != other and added & other == added for other in additions):
+                continue
+            child = coverage | added
+            if child in closed or (child in reached and reached[child][0] <= g + 1):
+                continue
+            reached[child] = (g + 1, coverage, index)
+            child_missing = missing & ~added
+            h = estimate(child_missing, [(mask & child_missing).bit_count() for mask in sets], sets) if child_missing else 0
+            heapq.heappush(frontier, (g + 1 + weight * h if not greedy else h, -(g + 1), child_missing.bit_count(), next(counter), child))
+    raise ValueError("no cover found")
+
+def main(argv: list[str] = None) -> None:
+    '''Command line entry point'''
+    parser = argparse.ArgumentParser(description="A* set cover on bitmasks")
+    parser.add_argument("--size", type=int, default=20, help="PROBLEM_SIZE, elements of the universe")
+    parser.add_argument("--sets", type=int, default=40, help="NUM_SETS")
+    parser.add_argument("--density", type=float, default=0.2, help="probability of every element in every set")
+    parser.add_argument("--heuristic", choices=HEURISTICS, default="h4")
+    parser.add_argument("--weight", type=float, default=1, help="weighted A*, the cover is at most this many times the smallest (inf: greedy best-first)")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+    sets = make_problem(args.size, args.sets, args.density, args.seed)
+    start = time.perf_counter()
+    solution = solve(sets, args.size, args.heuristic, args.weight)
+    print(f"Solved in {solution.steps} steps ({len(solution.taken)} tiles): {sorted(solution.taken)}, "
+          f"{solution.pushed} states pushed, {time.perf_counter() - start:.2f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+import argparse
+import multiprocessing
+import os
+import random
+from collections import namedtuple
+from functools import lru_cache, reduce
+from operator import xor
+
+# Nim and the evolutionary strategy of Nim.ipynb as a module. The analysis of a position (its moves, the nim-sum after each of them and
+# the moves every strategy picks from) is computed once per row configuration and cached, so a ply is a table lookup and a random choice.
+# Strategies draw from the global random module as in the notebook, the simulation draws from seeded random.Random instances
+
+Nimply = namedtuple("Nimply", "row, num_objects")
+
+# Everything the strategies need about a position: moves in the order of the notebook (by row, then by number of objects),
+# the rows and nim-sum after each move, and the indices of the moves the strategies choose among
+Analysis = namedtuple("Analysis", ["moves", "results", "nim_sums", "spicy", "lower_half", "upper_half", "row_offsets", "gabriele"])
+
+class Nim:
+    def __init__(self, num_rows: int, k: int = None) -> None:
+        self._rows = [i * 2 + 1 for i in range(num_rows)]
+        self._k = k
+
+    def __bool__(self):
+        return sum(self._rows) > 0
+
+    def __str__(self):
+        return "<" + " ".join(str(_) for _ in self._rows) + ">"
+
+    @property
+    def rows(self) -> tuple:
+        return tuple(self._rows)
+
+    @property
+    def k(self) -> int | None:
+        return self._k
+
+    def nimming(self, ply: Nimply) -> None:
+        row, num_objects = ply
+        assert self._rows[row] >= num_objects
+        assert self._k is None or num_objects <= self._k
+        self._rows[row] -= num_objects
+
+def nim_sum(state: Nim) -> int:
+    '''XOR of the rows'''
+    return reduce(xor, state.rows, 0)
+
+@lru_cache(maxsize=None)
+def analysis(rows: tuple[int, ...], k: int = None) -> Analysis:
+    '''Analysis of the position with these rows, at most k objects removed per move. Cached: positions repeat across games'''
+    total = reduce(xor, rows, 0)
+    moves, results, nim_sums, row_offsets = [], [], [], []
+    for row, count in enumerate(rows):
+        row_offsets.append(len(moves))
+        for num_objects in range(1, (count if k is None else min(count, k)) + 1):
+            moves.append(Nimply(row, num_objects))
+            results.append(rows[:row] + (count - num_objects,) + rows[row + 1:])
+            # only one row changes: its old count leaves the nim-sum and its new count enters it
+            nim_sums.append(total ^ count ^ (count - num_objects))
+    if not moves:
+        return Analysis((), (), (), (), (), (), tuple(row_offsets), None)
+    every = tuple(range(len(moves)))
+    spicy = tuple(i for i in every if nim_sums[i] != 0) or every
+    threshold = (min(nim_sums) + max(nim_sums)) / 2
+    lower_half = tuple(i for i in every if nim_sums[i] <= threshold)
+    upper_half = tuple(i for i in every if nim_sums[i] >= threshold)
+    # the maximum number of objects of the lowest row
+    gabriele = max(every, key=lambda i: (-moves[i].row, moves[i].num_objects))
+    return Analysis(tuple(moves), tuple(results), tuple(nim_sums), spicy, lower_half, upper_half, tuple(row_offsets), gabriele)
+
+def analize(raw: Nim) -> dict:
+    '''Possible moves and the nim-sum after each of them, as the notebook'''
+    table = analysis(raw.rows, raw.k)
+    return {"possible_moves": dict(zip(table.moves, table.nim_sums))}
+
+# Move choices by index into the analysis, rng is the random module or a random.Random
+
+def _pure_random_index(table: Analysis, rows: tuple[int, ...], rng) -> int:
+    row = rng.choice([r for r, c in enumerate(rows) if c > 0])
+    last = table.row_offsets[row + 1] if row + 1 < len(rows) else len(table.moves)
+    return table.row_offsets[row] + rng.randint(1, last - table.row_offsets[row]) - 1
+
+def _gabriele_index(table: Analysis, rows: tuple[int, ...], rng) -> int:
+    return table.gabriele
+
+def _optimal_index(table: Analysis, rows: tuple[int, ...], rng) -> int:
+    return rng.choice(table.spicy)
+
+def _adaptive_index(table: Analysis, genome: dict, rng) -> int:
+    if rng.random() < genome.get("preference", 0.5):
+        return rng.choice(table.lower_half if genome.get("use_lower_half", True) else table.upper_half)
+    return rng.choice(range(len(table.moves)))
+
+# Opponents by name, so they can be sent to worker processes
+OPPONENTS = {"pure_random": _pure_random_index, "gabriele": _gabriele_index, "optimal": _optimal_index}
+
+def pure_random(state: Nim) -> Nimply:
+    """A completely random move"""
+    table = analysis(state.rows, state.k)
+    return table.moves[_pure_random_index(table, state.rows, random)]
+
+def gabriele(state: Nim) -> Nimply:
+    """Pick always the maximum possible number of the lowest row"""
+    table = analysis(state.rows, state.k)
+    return table.moves[table.gabriele]
+
+def optimal(state: Nim) -> Nimply:
+    '''A random move among the ones leaving a nim-sum other than 0, any move if there are none'''
+    table = analysis(state.rows, state.k)
+    return table.moves[_optimal_index(table, state.rows, random)]
+
+def adaptive_strategy(genome: dict):
+    '''Strategy of a genome: with probability preference, a move in the lower (or upper) half of the nim-sums of the moves, otherwise any move'''
+    def adaptive(state: Nim) -> Nimply:
+        table = analysis(state.rows, state.k)
+        return table.moves[_adaptive_index(table, genome, random)]
+    return adaptive
+
+def play_nim_game(strategy1, strategy2, initial_nim_state: Nim) -> int:
+    '''Plays strategy1 (first) against strategy2, returns the index of the winner: the one not taking the last object'''
+    nim = initial_nim_state
+    player = 0
+    while nim:
+        ply = strategy1(nim) if player == 0 else strategy2(nim)
+        nim.nimming(ply)
+        player = 1 - player
+    return player
+
+def play_games(genome: dict, opponent: str, n_games: int, num_rows: int = 5, k: int = None, rng=random) -> int:
+    '''Games won by a genome playing first against an opponent of OPPONENTS, on rows tuples without Nim objects'''
+    choose = OPPONENTS[opponent]
+    start = Nim(num_rows, k).rows
+    wins = 0
+    for _ in range(n_games):
+        rows = start
+        player = 0
+        while any(rows):
+            table = analysis(rows, k)
+            index = _adaptive_index(table, genome, rng) if player == 0 else choose(table, rows, rng)
+            rows = table.results[index]
+            player = 1 - player
+        wins += player == 0
+    return wins
+
+def _play_task(task: tuple[dict, str, int, int, int | None, str]) -> int:
+    genome, opponent, n_games, num_rows, k, seed = task
+    return play_games(genome, opponent, n_games, num_rows, k, random.Random(seed))
+
+def evaluate_generation(population: list[dict], n_games: int, opponent: str = "optimal", num_rows: int = 5, k: int = None,
+                        seed=0, generation: int = 0, pool=None) -> list[int]:
+    '''
+    Games won by every individual out of n_games, across the pool if given. Every individual plays with its own generator,
+    seeded by seed, generation and its index, so the result is the same with any number of workers. With seed None the games are not reproducible
+    '''
+    tasks = [(genome, opponent, n_games, num_rows, k, None if seed is None else f"{seed}:{generation}:{index}") for index, genome in enumerate(population)]
+    return pool.map(_play_task, tasks) if pool else [_play_task(task) for task in tasks]
+
+def generate_random_genome(rng=random) -> dict:
+    return {"preference": rng.uniform(0, 1), "use_lower_half": rng.choice([True, False]), "fitness": 0}
+
+def tournament_selection(population: list[dict], tournament_size: int, rng=random) -> dict:
+    return max(rng.sample(list(population), tournament_size), key=lambda player: player["fitness"])
+
+def crossover(parent1: dict, parent2: dict, rng=random) -> dict:
+    '''Every gene comes from a parent with a probability proportional to its fitness'''
+    total_fitness = parent1["fitness"] + parent2["fitness"]
+    weight_parent1 = parent1["fitness"] / total_fitness if total_fitness else 0.5
+    child_genome = {"preference": None, "use_lower_half": None, "fitness": 0}
+    for key in ["preference", "use_lower_half"]:
+        child_genome[key] = parent1[key] if rng.random() < weight_parent1 else parent2[key]
+    return child_genome
+
+def mutate(child_genome: dict, mutation_rate: float, rng=random) -> dict:
+    if rng.random() < mutation_rate:
+        child_genome["preference"] = rng.uniform(0, 1)
+    if rng.random() < mutation_rate:
+        child_genome["use_lower_half"] = rng.choice([True, False])
+    return child_genome
+
+def generate_new_population(selected_parents: list[dict], n_individuals: int, mutation_rate: float, rng=random) -> list[dict]:
+    new_population = []
+    while len(new_population) < n_individuals:
+        parent1 = rng.choice(selected_parents)
+        parent2 = rng.choice(selected_parents)
+        new_population.append(mutate(crossover(parent1, parent2, rng), mutation_rate, rng))
+    return new_population
+
+def simulation(generations: int, n_games: int, pop_size: int, n_parents: int, tournament_size: int, mutation_rate: float,
+               opponent: str = "optimal", num_rows: int = 5, k: int = None, seed=None, workers: int = 1, report=None) -> tuple[list[dict], list[int]]:
+    '''
+    The evolutionary strategy of the notebook. Every generation is evaluated with evaluate_generation and its fitness stored in new genome dicts.
+    report(generation, wins, games) is called after every evaluation. Returns the last population and the wins of every generation
+    '''
+    rng = random.Random(seed)
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    population = [generate_random_genome(rng) for _ in range(pop_size)]
+    history = []
+    try:
+        for generation in range(generations):
+            wins = evaluate_generation(population, n_games, opponent, num_rows, k, seed, generation, pool)
+            population = [{**genome, "fitness": fitness} for genome, fitness in zip(population, wins)]
+            history.append(sum(wins))
+            if report:
+                report(generation, sum(wins), pop_size * n_games)
+            if generation < generations - 1:
+                selected_parents = [tournament_selection(population, tournament_size, rng) for _ in range(n_parents)]
+                population = generate_new_population(selected_parents, pop_size, mutation_rate, rng)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return population, history
+
+def main(argv: list[str] = None) -> None:
+    '''Command line entry point: the simulation of the notebook, then the best player against every opponent'''
+    parser = argparse.ArgumentParser(description="Evolutionary strategy for Nim")
+    parser.add_argument("--generations", type=int, default=10)
+    parser.add_argument("--games", type=int, default=1000, help="games per individual and generation")
+    parser.add_argument("--population", type=int, default=100)
+    parser.add_argument("--parents", type=int, default=50)
+    parser.add_argument("--tournament", type=int, default=20)
+    parser.add_argument("--mutation-rate", type=float, default=0.1)
+    parser.add_argument("--rows", type=int, default=5)
+    parser.add_argument("--k", type=int, help="maximum objects removed per move")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    args = parser.parse_args(argv)
+
+    def report(generation, wins, games):
+        print(f"Generation {generation + 1}:")
+        print(f"They won {wins} games in {games} games")
+        print(f"The percentage of won games of this generation is: {wins / games:.2%}\n")
+
+    population, _ = simulation(args.generations, args.games, args.population, args.parents, args.tournament, args.mutation_rate,
+                               num_rows=args.rows, k=args.k, seed=args.seed, workers=args.workers, report=report)
+    best_player = max(population, key=lambda x: x["fitness"])
+    rng = random.Random(args.seed)
+    for opponent, title in (("gabriele", "Gabriele Strategy"), ("pure_random", "Pure Random Strategy"), ("optimal", "Optimal: The Rematch!")):
+        wins = play_games(best_player, opponent, 1000, args.rows, args.k, rng)
+        print(f"Best Player vs {title}")
+        print(f"They won {wins} games in 1000 games")
+        print(f"The percentage of won games is: {wins / 10}%\n")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import numpy as np
+
+# Vectorized version of the evolutionary algorithm of lab3.ipynb. The population is a single (population_size, genome_length) uint8 array
+# of 0/1 loci and every operator works on the whole population at once, driven by a seeded numpy Generator.
+# Operators and parameters are the ones of evolve in the notebook: elitism, parents sampled from the elite, one-point crossover, bit-flip mutation
+
+GENOME_LENGTH = 1000
+
+def initialize_population(rng: np.random.Generator, population_size: int, genome_length: int = GENOME_LENGTH) -> np.ndarray:
+    '''Random population, every locus is 0 or 1 with the same probability'''
+    return rng.integers(0, 2, size=(population_size, genome_length), dtype=np.uint8)
+
+def evaluate(fitness, population: np.ndarray) -> np.ndarray:
+    '''Fitness of every individual. Uses fitness.evaluate_batch when the problem has it, otherwise calls fitness once per individual'''
+    evaluate_batch = getattr(fitness, "evaluate_batch", None)
+    if evaluate_batch is not None:
+        return np.asarray(evaluate_batch(population), dtype=float)
+    return np.fromiter((fitness(individual) for individual in population.tolist()), dtype=float, count=len(population))
+
+def select_elite(scores: np.ndarray, elite_size: int) -> np.ndarray:
+    '''Indices of the elite_size best individuals, best first. Ties keep the population order, as the stable sort of the notebook'''
+    return np.argsort(-scores, kind="stable")[:elite_size]
+
+def select_parents(rng: np.random.Generator, n_children: int, n_candidates: int) -> tuple[np.ndarray, np.ndarray]:
+    '''Two distinct candidates per child, as random.sample(elite, 2)'''
+    first = rng.integers(0, n_candidates, n_children)
+    second = rng.integers(0, n_candidates - 1, n_children)
+    # skipping the first parent keeps the second uniform among the others
+    second += second >= first
+    return first, second
+
+def tournament(rng: np.random.Generator, scores: np.ndarray, n_winners: int, tournament_size: int) -> np.ndarray:
+    '''Indices of the winners of n_winners tournaments among tournament_size random individuals each'''
+    contestants = rng.integers(0, len(scores), size=(n_winners, tournament_size))
+    return contestants[np.arange(n_winners), scores[contestants].argmax(axis=1)]
+
+def crossover(rng: np.random.Generator, parents1: np.ndarray, parents2: np.ndarray) -> np.ndarray:
+    '''One-point crossover of every pair: the loci before a random cut point in [1, genome_length - 1] come from the first parent'''
+    n_children, genome_length = parents1.shape
+    cut_points = rng.integers(1, genome_length, n_children)
+    from_first = np.arange(genome_length) < cut_points[:, None]
+    return np.where(from_first, parents1, parents2)
+
+def mutate(rng: np.random.Generator, population: np.ndarray, mutation_rate: float) -> np.ndarray:
+    '''Flips every locus with probability mutation_rate, in place'''
+    if mutation_rate <= 0:
+        return population
+    if mutation_rate >= 1:
+        population ^= 1
+        return population
+    loci = population.reshape(-1)
+    # the Bernoulli mask of the whole population, drawn as the geometric gaps between flipped loci:
+    # about size * mutation_rate random numbers instead of one per locus
+    expected = loci.size * mutation_rate
+    last = -1
+    while True:
+        flipped = last + np.cumsum(rng.geometric(mutation_rate, int(expected + 4 * np.sqrt(expected)) + 16))
+        loci[flipped[flipped < loci.size]] ^= 1
+        if flipped[-1] >= loci.size:
+            return population
+        last = flipped[-1]
+
+def next_generation(rng: np.random.Generator, population: np.ndarray, scores: np.ndarray, elitism_percentage: float, mutation_rate: float, tournament_size: int = None) -> np.ndarray:
+    '''
+    The elite survives as it is, the rest of the new population are mutated children of two parents.
+    Parents are distinct members of the elite as in the notebook, or tournament winners in the whole population if tournament_size is given
+    '''
+    population_size = len(population)
+    elite_size = int(elitism_percentage * population_size)
+    if elite_size < 2 and tournament_size is None:
+        raise ValueError("the elite needs at least 2 individuals to pick parents from")
+    elite = select_elite(scores, elite_size)
+    n_children = population_size - elite_size
+    if tournament_size is None:
+        first, second = select_parents(rng, n_children, elite_size)
+        parents1, parents2 = population[elite[first]], population[elite[second]]
+    else:
+        parents1 = population[tournament(rng, scores, n_children, tournament_size)]
+        parents2 = population[tournament(rng, scores, n_children, tournament_size)]
+    children = mutate(rng, crossover(rng, parents1, parents2), mutation_rate)
+    return np.concatenate((population[elite], children))
+
+def evolve(fitness, generations: int, population_size: int, mutation_rate: float, elitism_percentage: float,
+           genome_length: int = GENOME_LENGTH, seed: int = None, tournament_size: int = None, on_generation=None) -> np.ndarray:
+    '''
+    Same algorithm and fitness calls as evolve in lab3.ipynb: the population is evaluated at every generation and once more at the end.
+    Returns the best individual of the final population.
+    on_generation(generation, scores) is called after every evaluation; if it returns True the run stops there and the best individual evaluated so far is returned
+    '''
+    rng = np.random.default_rng(seed)
+    population = initialize_population(rng, population_size, genome_length)
+    for generation in range(generations):
+        scores = evaluate(fitness, population)
+        if on_generation is not None and on_generation(generation, scores):
+            return population[int(np.argmax(scores))]
+        population = next_generation(rng, population, scores, elitism_percentage, mutation_rate, tournament_size)
+    # first best individual of the final population, as max in the notebook
+    return population[int(np.argmax(evaluate(fitness, population)))]
@@ -0,0 +1,184 @@
+import argparse
+import multiprocessing
+import time
+from collections import namedtuple
+import numpy as np
+import lab9_lib
+from ga_engine import GENOME_LENGTH, evaluate, initialize_population, next_generation
+
+# Island model: every island is a population evolved by the operators of ga_engine in its own process. Every migration_interval generations
+# each island sends copies of its best individuals to its neighbours, where they replace the worst ones. Migration is synchronous,
+# so given the seed and no budget the result does not depend on how the processes are scheduled. All islands draw their evaluations
+# from one shared budget, first come first served: with a budget, which island runs out first, and so the result, depends on scheduling
+
+# Topologies: number of islands -> out-neighbours of every island
+TOPOLOGIES = {
+    "ring": lambda n: [[(i + 1) % n] for i in range(n)] if n > 1 else [[]],
+    "bidirectional_ring": lambda n: [sorted({(i - 1) % n, (i + 1) % n} - {i}) for i in range(n)],
+    "complete": lambda n: [[j for j in range(n) if j != i] for i in range(n)],
+}
+
+IslandResult = namedtuple("IslandResult", ["best", "fitness", "calls", "generations", "island_fitness"])
+
+class Budget(object):
+    '''Fitness calls shared by every island, in shared memory. Calls are reserved before an evaluation, so the budget is never exceeded'''
+    def __init__(self, limit: int = None) -> None:
+        self.limit = limit
+        self._used = multiprocessing.Value("q", 0)
+
+    @property
+    def used(self) -> int:
+        return self._used.value
+
+    def reserve(self, calls: int) -> bool:
+        with self._used.get_lock():
+            if self.limit is not None and self._used.value + calls > self.limit:
+                return False
+            self._used.value += calls
+            return True
+
+    def refund(self, calls: int) -> None:
+        '''Gives back reserved calls that were not made, as the genomes found in the cache'''
+        with self._used.get_lock():
+            self._used.value -= calls
+
+class Island(object):
+    '''One population with its own problem instance, generator and best individual'''
+    def __init__(self, instance: int, population_size: int, mutation_rate: float, elitism_percentage: float,
+                 genome_length: int, seed, cache_size: int = 0, tournament_size: int = None) -> None:
+        self.fitness = lab9_lib.make_problem(instance, cache_size)
+        self.rng = np.random.default_rng(seed)
+        self.mutation_rate = mutation_rate
+        self.elitism_percentage = elitism_percentage
+        self.tournament_size = tournament_size
+        self.population = initialize_population(self.rng, population_size, genome_length)
+        self.scores = None
+        self.best, self.best_fitness = None, float("-inf")
+
+    def evaluate(self, budget: Budget) -> bool:
+        '''Evaluates the population within the budget, False if the budget has not enough calls left'''
+        if not budget.reserve(len(self.population)):
+            return False
+        calls = self.fitness.calls
+        self.scores = evaluate(self.fitness, self.population)
+        budget.refund(len(self.population) - (self.fitness.calls - calls))
+        best = int(np.argmax(self.scores))
+        if self.scores[best] > self.best_fitness:
+            self.best, self.best_fitness = self.population[best].copy(), float(self.scores[best])
+        return True
+
+    def emigrants(self, count: int) -> tuple[np.ndarray, np.ndarray]:
+        '''Copies of the count best individuals and their scores'''
+        best = np.argsort(-self.scores, kind="stable")[:count]
+        return self.population[best].copy(), self.scores[best].copy()
+
+    def immigrate(self, individuals: np.ndarray, scores: np.ndarray) -> None:
+        '''Replaces the worst individuals, their scores come along so they are not evaluated again'''
+        worst = np.argsort(self.scores, kind="stable")[:len(individuals)]
+        self.population[worst] = individuals
+        self.scores[worst] = scores
+
+    def breed(self) -> None:
+        self.population = next_generation(self.rng, self.population, self.scores, self.elitism_percentage, self.mutation_rate, self.tournament_size)
+
+def island_worker(index: int, settings: dict, seed, budget: Budget, out_neighbours: list[int], in_neighbours: list[int],
+                  inboxes: list, results) -> None:
+    '''
+    Evolves island index for settings["generations"] generations or until the budget runs out, migrating every settings["migration_interval"].
+    Messages are (generation, sender, individuals, scores), or (None, sender) when the sender has stopped
+    '''
+    island = Island(settings["instance"], settings["population_size"], settings["mutation_rate"], settings["elitism_percentage"],
+                    settings["genome_length"], seed, settings["cache_size"], settings["tournament_size"])
+    generations, interval, migrants = settings["generations"], settings["migration_interval"], settings["migrants"]
+    stopped = set()
+    early = {}  # messages of later migrations from neighbours ahead of this island
+    generation = 0
+    # evaluated generations + 1 times, as evolve: the last evaluation is of the final population
+    while island.evaluate(budget) and generation < generations:
+        if interval and (generation + 1) % interval == 0:
+            individuals, scores = island.emigrants(migrants)
+            for neighbour in out_neighbours:
+                inboxes[neighbour].put((generation, index, individuals, scores))
+            arrived = []
+            waiting = set(in_neighbours) - stopped
+            while waiting:
+                for sender in list(waiting):
+                    if (generation, sender) in early:
+                        arrived.append(early.pop((generation, sender)))
+                        waiting.discard(sender)
+                if not waiting:
+                    break
+                message = inboxes[index].get()
+                if message[0] is None:
+                    stopped.add(message[1])
+                    waiting.discard(message[1])
+                else:
+                    early[message[:2]] = message[2:]
+            for individuals, scores in arrived:
+                island.immigrate(individuals, scores)
+        island.breed()
+        generation += 1
+    for neighbour in out_neighbours:
+        inboxes[neighbour].put((None, index))
+    # every message sent to this island is consumed before it exits, so no sender blocks on a full pipe
+    while not set(in_neighbours) <= stopped:
+        message = inboxes[index].get()
+        if message[0] is None:
+            stopped.add(message[1])
+    results.put((index, island.best, island.best_fitness, island.fitness.calls, generation))
+
+def evolve_islands(instance: int, islands: int = 4, population_size: int = 250, generations: int = 100, mutation_rate: float = 0.001,
+                   elitism_percentage: float = 0.1, migration_interval: int = 2, migrants: int = 10, topology: str = "ring",
+                   budget: int = None, seed: int = None, genome_length: int = GENOME_LENGTH, cache_size: int = 0,
+                   tournament_size: int = None) -> IslandResult:
+    '''
+    Runs islands populations of population_size in parallel processes. budget caps the fitness calls of all islands together;
+    calls of the result is the total made, the sum of the calls counted by every island's problem
+    '''
+    settings = {"instance": instance, "population_size": population_size, "generations": generations, "mutation_rate": mutation_rate,
+                "elitism_percentage": elitism_percentage, "migration_interval": migration_interval, "migrants": migrants,
+                "genome_length": genome_length, "cache_size": cache_size, "tournament_size": tournament_size}
+    out_neighbours = TOPOLOGIES[topology](islands)
+    in_neighbours = [[i for i in range(islands) if j in out_neighbours[i]] for j in range(islands)]
+    seeds = np.random.SeedSequence(seed).spawn(islands)
+    shared_budget = Budget(budget)
+    inboxes = [multiprocessing.Queue() for _ in range(islands)]
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=island_worker, daemon=True,
+                                         args=(i, settings, seeds[i], shared_budget, out_neighbours[i], in_neighbours[i], inboxes, results))
+                 for i in range(islands)]
+    for process in processes:
+        process.start()
+    finished = sorted(results.get() for _ in range(islands))
+    for process in processes:
+        process.join()
+    best = max(finished, key=lambda result: result[2])
+    calls = sum(result[3] for result in finished)
+    if calls != shared_budget.used:
+        raise RuntimeError("fitness calls lost between the islands and the budget")
+    return IslandResult(best[1], best[2], calls, max(result[4] for result in finished), [result[2] for result in finished])
+
+def main(argv: list[str] = None) -> None:
+    '''Command line entry point'''
+    parser = argparse.ArgumentParser(description="Island model GA on a lab9_lib problem")
+    parser.add_argument("--instance", type=int, default=10, help="problem instance")
+    parser.add_argument("--islands", type=int, default=4, help="number of islands, one process each")
+    parser.add_argument("--population", type=int, default=250, help="population of every island")
+    parser.add_argument("--generations", type=int, default=100, help="generations of every island")
+    parser.add_argument("--mutation-rate", type=float, default=0.001)
+    parser.add_argument("--elitism", type=float, default=0.1)
+    parser.add_argument("--interval", type=int, default=2, help="generations between migrations, 0 for isolated islands")
+    parser.add_argument("--migrants", type=int, default=10, help="individuals sent to every neighbour")
+    parser.add_argument("--topology", choices=TOPOLOGIES, default="ring")
+    parser.add_argument("--budget", type=int, help="fitness calls of all islands together")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    result = evolve_islands(args.instance, args.islands, args.population, args.generations, args.mutation_rate, args.elitism,
+                            args.interval, args.migrants, args.topology, args.budget, args.seed)
+    print(f"Instance {args.instance}: fitness {result.fitness:.2%} with {result.calls} fitness calls, "
+          f"{result.generations} generations, {time.perf_counter() - start:.2f} s")
+    print("Islands: " + ", ".join(f"{fitness:.2%}" for fitness in result.island_fitness))
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,19 @@
 # Free for personal or classroom use; see 'LICENSE.md' for details.
 
 from abc import abstractmethod
+from collections import OrderedDict
+
+import numpy as np
 
 
 class AbstractProblem:
-    def __init__(self):
+    def __init__(self, cache_size=0):
+        # calls counts the fitness values actually computed: a genome answered by the cache is not counted again
         self._calls = 0
+        self._cache_hits = 0
+        # opt-in LRU cache of fitness values by packed genome, at most cache_size entries (0 disables it)
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
 
     @property
     @abstractmethod
@@ -18,11 +26,42 @@ class AbstractProblem:
     def calls(self):
         return self._calls
 
+    @property
+    def cache_hits(self):
+        return self._cache_hits
+
+    @staticmethod
+    def genome_key(genome):
+        genome = np.asarray(genome, dtype=bool)
+        return len(genome), np.packbits(genome).tobytes()
+
+    def _cached(self, key):
+        if key not in self._cache:
+            return None
+        self._cache_hits += 1
+        self._cache.move_to_end(key)
+        return self._cache[key]
+
+    def _store(self, key, value):
+        self._cache[key] = value
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
     @staticmethod
     def onemax(genome):
         return sum(bool(g) for g in genome)
 
     def __call__(self, genome):
+        if self._cache_size:
+            key = self.genome_key(genome)
+            value = self._cached(key)
+            if value is None:
+                value = self._fitness(genome)
+                self._store(key, value)
+            return value
+        return self._fitness(genome)
+
+    def _fitness(self, genome):
         self._calls += 1
         fitnesses = sorted((AbstractProblem.onemax(genome[s :: self.x]) for s in range(self.x)), reverse=True)
         val = sum(f for f in fitnesses if f == fitnesses[0]) - sum(
@@ -30,12 +69,60 @@ class AbstractProblem:
         )
         return val / len(genome)
 
+    def evaluate_batch(self, population):
+        """Fitness of every row of a (n, genome_length) 0/1 array, the same values as calling the problem on each row"""
+        population = np.asarray(population)
+        if not self._cache_size:
+            return self._fitness_batch(population)
+        genomes = np.asarray(population, dtype=bool)
+        packed = np.packbits(genomes, axis=1)
+        keys = [(genomes.shape[1], row.tobytes()) for row in packed]
+        values = np.empty(len(population))
+        # rows to compute by key, a genome repeated in the population is computed and counted once
+        missing = {}
+        for i, key in enumerate(keys):
+            value = self._cached(key)
+            if value is not None:
+                values[i] = value
+            elif key in missing:
+                self._cache_hits += 1
+            else:
+                missing[key] = i
+        if missing:
+            computed = dict(zip(missing, self._fitness_batch(genomes[list(missing.values())]).tolist()))
+            for key, value in computed.items():
+                self._store(key, value)
+            for i, key in enumerate(keys):
+                if key in computed:
+                    values[i] = computed[key]
+        return values
+
+    def _fitness_batch(self, population):
+        self._calls += len(population)
+        n, length = population.shape
+        x = self.x
+        # onemax of every stride s (loci s, s + x, ...) of every genome, as a product with the 0/1 matrix of the loci of each stride.
+        # float32 counts are exact well beyond any genome length
+        strides = (np.arange(length)[:, None] % x == np.arange(x)).astype(np.float32)
+        onemax = ((population != 0).astype(np.float32) @ strides).astype(np.int64)
+        fitnesses = -np.sort(-onemax, axis=1)
+        best = fitnesses[:, :1]
+        ties = (fitnesses == best).sum(axis=1)
+        val = (fitnesses * (fitnesses == best)).sum(axis=1)
+        # the k-th stride below the best costs f * 0.1 ** (k + 1), summed in the order of __call__ so the values are identical
+        powers = np.array([0.1 ** k for k in range(x + 1)])
+        penalty = np.zeros(n)
+        for position in range(x):
+            below = position >= ties
+            penalty += np.where(below, fitnesses[:, position] * powers[np.maximum(position - ties + 1, 0)], 0.0)
+        return (val - penalty) / length
+
 
-def make_problem(a):
+def make_problem(a, cache_size=0):
     class Problem(AbstractProblem):
         @property
         @abstractmethod
         def x(self):
             return a
 
-    return Problem()
+    return Problem(cache_size)
@@ -0,0 +1,223 @@
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import time
+import lab9_lib
+from ga_engine import GENOME_LENGTH, evolve
+
+# Grid of lab3.ipynb
+POPULATION_SIZE = [100, 200, 500, 1000]
+GENERATIONS = [10, 20, 50, 100]
+MUTATION_RATE = [0.001, 0.01, 0.1]
+ELITISM_PERCENTAGE = [0.1, 0.2, 0.3]
+CHOICES = [1, 2, 5, 10]
+
+# Fields identifying a run in the results file
+KEY_FIELDS = ("instance", "population_size", "generations", "mutation_rate", "elitism_percentage", "seed")
+
+def run_seed(base_seed: int, instance: int, population_size: int, generations: int, mutation_rate: float, elitism_percentage: float) -> int:
+    '''Seed of a run, derived from its configuration only: the same run gets the same seed whatever the order, the workers or the resumes'''
+    text = f"{base_seed}:{instance}:{population_size}:{generations}:{mutation_rate}:{elitism_percentage}"
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], "little")
+
+def configurations(base_seed: int = 0, choices=CHOICES, population_sizes=POPULATION_SIZE, generations=GENERATIONS,
+                   mutation_rates=MUTATION_RATE, elitism_percentages=ELITISM_PERCENTAGE) -> list[dict]:
+    '''Every run of the grid, cheapest first (fitness calls are population_size * (generations + 1)) so pruning has finished runs to compare with'''
+    runs = [{"instance": x, "population_size": pop, "generations": gen, "mutation_rate": mut, "elitism_percentage": elit,
+             "seed": run_seed(base_seed, x, pop, gen, mut, elit)}
+            for x, pop, gen, mut, elit in itertools.product(choices, population_sizes, generations, mutation_rates, elitism_percentages)]
+    return sorted(runs, key=lambda config: config["population_size"] * (config["generations"] + 1))
+
+def run_key(record: dict) -> tuple:
+    return tuple(record[field] for field in KEY_FIELDS)
+
+def run(task: tuple[dict, dict[int, float], float | None, int]) -> dict:
+    '''
+    Runs one configuration, returns its record. task is (configuration, frontier, prune margin, cache size), the frontier being the
+    best fitness of the finished runs of the same instance and population size by number of generations. With a margin, the run stops
+    after a number of generations in the frontier if its current best is lower by more than the margin: another mutation rate and
+    elitism reached much more with the same fitness calls
+    '''
+    config, frontier, margin, cache_size = task
+    fitness = lab9_lib.make_problem(config["instance"], cache_size)
+    stopped = []
+
+    def prune(generation, scores):
+        # the scores are of the population after generation breedings, as the final population of a run of that many generations
+        if frontier.get(generation, float("-inf")) > float(scores.max()) + margin:
+            stopped.append(generation)
+            return True
+        return False
+
+    start = time.perf_counter()
+    best = evolve(fitness, config["generations"], config["population_size"], config["mutation_rate"], config["elitism_percentage"],
+                  GENOME_LENGTH, config["seed"], on_generation=prune if margin is not None and frontier else None)
+    calls = fitness.calls
+    # calls is read first: scoring the returned individual is not part of the cost of the search
+    value = float(fitness.evaluate_batch(best[None])[0])
+    return {**config, "fitness": value, "calls": calls, "pruned": bool(stopped),
+            "generations_run": stopped[0] if stopped else config["generations"], "time": time.perf_counter() - start}
+
+def read_results(path: str) -> list[dict]:
+    '''Records of a results file. A last line cut by an interruption is ignored'''
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path) as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                pass
+    return records
+
+def _drop_partial_line(path: str) -> None:
+    '''Truncates a results file after its last complete line, so new records do not get glued to a line cut by an interruption'''
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as file:
+        data = file.read()
+        if data and not data.endswith(b"\n"):
+            file.truncate(data.rfind(b"\n") + 1)
+
+def sweep(path: str, runs: list[dict], workers: int = 1, margin: float = None, cache_size: int = 0, progress=None) -> int:
+    '''
+    Runs every configuration not already in the results file and appends each record as soon as it finishes, so an interrupted sweep
+    resumes where it stopped. At most 2 * workers runs are in flight, each started with the frontier of the finished runs of its instance
+    and population size. Returns the number of runs made
+    '''
+    _drop_partial_line(path)
+    records = read_results(path)
+    done = {run_key(record) for record in records}
+    todo = [config for config in runs if run_key(config) not in done]
+    # best fitness of the finished runs by (instance, population size) and number of generations
+    frontier = {}
+
+    def add_to_frontier(record):
+        # a pruned run did not complete, its fitness is no bound for the others
+        if not record["pruned"]:
+            best = frontier.setdefault((record["instance"], record["population_size"]), {})
+            best[record["generations"]] = max(best.get(record["generations"], float("-inf")), record["fitness"])
+
+    for record in records:
+        add_to_frontier(record)
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    pending = []
+    bar = progress(total=len(todo)) if progress else None
+    with open(path, "a") as file:
+
+        def finish(record):
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+            add_to_frontier(record)
+            if bar:
+                bar.update()
+
+        try:
+            for config in todo:
+                task = (config, dict(frontier.get((config["instance"], config["population_size"]), {})), margin, cache_size)
+                if pool is None:
+                    finish(run(task))
+                    continue
+                pending.append(pool.apply_async(run, (task,)))
+                while len(pending) >= 2 * workers:
+                    finish(pending.pop(0).get())
+            while pending:
+                finish(pending.pop(0).get())
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+            if bar:
+                bar.close()
+    return len(todo)
+
+def read_output_md(path: str) -> list[dict]:
+    '''Records of the runs printed by the notebook (output.md), with the fitness calls it counted. They have no seed'''
+    pattern = re.compile(r"With POPULATION SIZE (\d+), GENERATIONS (\d+), MUTATION RATE ([\d.]+) and ELITISM PERCENTAGE ([\d.]+)\s+"
+                         r"Fitness: ([\d.]+)%\s+Number of fitness calls: (\d+)")
+    records = []
+    with open(path) as file:
+        text = file.read()
+    for block in re.split(r"(?=Instance number: \d+\n)", text):
+        header = re.match(r"Instance number: (\d+)\n", block)
+        if header is None:
+            continue
+        instance = int(header.group(1))
+        for pop, gen, mut, elit, value, calls in pattern.findall(block):
+            records.append({"instance": instance, "population_size": int(pop), "generations": int(gen), "mutation_rate": float(mut),
+                            "elitism_percentage": float(elit), "seed": None, "fitness": float(value) / 100, "calls": int(calls), "pruned": False})
+    return records
+
+def plot_data(records: list[dict]) -> dict[int, list[dict]]:
+    '''Fitness vs fitness calls of the finished runs, by instance, each run with the Pareto flag: no other run has more fitness with no more calls'''
+    data = {}
+    for record in records:
+        if not record.get("pruned"):
+            data.setdefault(record["instance"], []).append(record)
+    for instance, points in data.items():
+        points.sort(key=lambda record: (record["calls"], -record["fitness"]))
+        best = -1.0
+        for record in points:
+            record["pareto"] = record["fitness"] > best
+            best = max(best, record["fitness"])
+    return dict(sorted(data.items()))
+
+def plot(records: list[dict], directory: str) -> list[str]:
+    '''Draws Graphs/instance-<x>.png from the records, returns the paths written'''
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    paths = []
+    for instance, points in plot_data(records).items():
+        figure, axes = plt.subplots()
+        axes.scatter([p["calls"] for p in points], [p["fitness"] for p in points], s=12)
+        front = [p for p in points if p["pareto"]]
+        axes.plot([p["calls"] for p in front], [p["fitness"] for p in front], color="red")
+        axes.set_title(f"Instance {instance}")
+        axes.set_xlabel("Fitness calls")
+        axes.set_ylabel("Fitness")
+        path = os.path.join(directory, f"instance-{instance}.png")
+        figure.savefig(path)
+        plt.close(figure)
+        paths.append(path)
+    return paths
+
+def main(argv: list[str] = None) -> None:
+    '''Command line entry point: "run" fills the results file, "plot" draws the graphs or prints their data from recorded runs only'''
+    parser = argparse.ArgumentParser(description="Lab03 hyper-parameter sweep")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="runs the missing configurations of the grid")
+    run_parser.add_argument("--results", default="results.jsonl", help="append-only results file, also the checkpoint")
+    run_parser.add_argument("--instances", nargs="+", type=int, default=CHOICES, help="problem instances")
+    run_parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    run_parser.add_argument("--seed", type=int, default=0, help="base seed of the per-run seeds")
+    run_parser.add_argument("--prune", type=float, metavar="MARGIN", help="stops runs behind a finished run with the same population and calls by more than this fitness")
+    run_parser.add_argument("--cache", type=int, default=0, help="fitness cache entries per run, repeated genomes are not counted as calls")
+    plot_parser = commands.add_parser("plot", help="fitness vs fitness calls of recorded runs")
+    plot_parser.add_argument("--results", default="results.jsonl", help="results file, or output.md of the notebook")
+    plot_parser.add_argument("--graphs", help="directory receiving instance-<x>.png, otherwise the data is printed")
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        from tqdm import tqdm
+        made = sweep(args.results, configurations(args.seed, args.instances), args.workers, args.prune, args.cache,
+                     progress=lambda total: tqdm(total=total, unit="run"))
+        print(f"{made} runs appended to {args.results}")
+        return
+    records = read_output_md(args.results) if args.results.endswith(".md") else read_results(args.results)
+    if args.graphs:
+        for path in plot(records, args.graphs):
+            print(path)
+        return
+    for instance, points in plot_data(records).items():
+        print(f"Instance {instance}")
+        for p in points:
+            print(f"{p['calls']:>8} {p['fitness']:.2%} {'*' if p['pareto'] else ' '} POPULATION SIZE {p['population_size']}, GENERATIONS {p['generations']}, "
+                  f"MUTATION RATE {p['mutation_rate']}, ELITISM PERCENTAGE {p['elitism_percentage']}")
+
+if __name__ == '__main__':
+    main()
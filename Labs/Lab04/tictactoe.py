@@ -0,0 +1,175 @@
+import argparse
+import time
+import numpy as np
+
+# Tic-tac-toe learner of TicTacToe.ipynb on arrays. A position is the base-3 number of its cells (0 empty, 1 X, 2 O, cell i = row * 3 + column
+# weighing 3 ** i), so the values of a player are a single array of 3 ** 9 entries instead of a dictionary keyed by frozensets.
+# The 8 symmetric positions share one entry, the one of the smallest code. X always moves first
+
+# Board of the notebook: the number of every cell, a line is any 3 numbers adding up to 15. Moves are cell indices here
+MAGIC = [2, 7, 6,
+         9, 5, 1,
+         4, 3, 8]
+
+N_CELLS = 9
+N_POSITIONS = 3 ** N_CELLS
+POWERS = 3 ** np.arange(N_CELLS)
+EMPTY, X, O = 0, 1, 2
+
+LINES = [(0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8), (0, 4, 8), (2, 4, 6)]
+
+# Cell permutations of the 8 symmetries of the board: cell i of the transformed board is cell permutation[i] of the original
+SYMMETRIES = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8],  # identity
+    [6, 3, 0, 7, 4, 1, 8, 5, 2],  # rotation by 90
+    [8, 7, 6, 5, 4, 3, 2, 1, 0],  # rotation by 180
+    [2, 5, 8, 1, 4, 7, 0, 3, 6],  # rotation by 270
+    [2, 1, 0, 5, 4, 3, 8, 7, 6],  # horizontal flip
+    [6, 7, 8, 3, 4, 5, 0, 1, 2],  # vertical flip
+    [0, 3, 6, 1, 4, 7, 2, 5, 8],  # main diagonal
+    [8, 5, 2, 7, 4, 1, 6, 3, 0],  # anti-diagonal
+]
+
+# Rewards of the notebook by learner: (win, loss, draw)
+REWARDS = {"x": (1, -1, 0), "o": (3, -6, 2)}
+
+# Lookup tables over every code
+CELLS = (np.arange(N_POSITIONS)[:, None] // POWERS) % 3  # cells of every position
+CANONICAL = np.min([(CELLS[:, permutation] * POWERS).sum(axis=1) for permutation in SYMMETRIES], axis=0)  # code of the shared entry
+WINNER = np.zeros(N_POSITIONS, dtype=np.int8)  # X or O if it has a line, EMPTY otherwise
+for line in LINES:
+    for piece in (X, O):
+        WINNER[(CELLS[:, list(line)] == piece).all(axis=1)] = piece
+
+def new_values() -> np.ndarray:
+    '''Values of a player before training: NaN for positions never seen, as the keys missing from the dictionary of the notebook'''
+    return np.full(N_POSITIONS, np.nan)
+
+def random_games(rng: np.random.Generator, n_games: int) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    n_games games of random moves on both sides, as training_game: the cells are filled in the order of a random permutation
+    until a line or a full board. Returns the code after every move (-1 once the game is over) and the winner of every game
+    '''
+    order = np.argsort(rng.random((n_games, N_CELLS)), axis=1)
+    pieces = np.where(np.arange(N_CELLS) % 2 == 0, X, O)
+    codes = np.cumsum(pieces * POWERS[order], axis=1)
+    winners = WINNER[codes]
+    over = winners != EMPTY
+    # the move that ends every game: its first line, the last cell otherwise
+    last = np.where(over.any(axis=1), over.argmax(axis=1), N_CELLS - 1)
+    codes[np.arange(N_CELLS) > last[:, None]] = -1
+    return codes, winners[np.arange(n_games), last]
+
+def update(values: np.ndarray, states: np.ndarray, rewards: np.ndarray, epsilon: float) -> None:
+    '''
+    Moves the value of every state towards its reward by epsilon, in the order given, as the loop of train. A state seen n times
+    in a batch ends at (1 - epsilon) ** n * v + sum over its j-th reward r_j of epsilon * (1 - epsilon) ** (n - 1 - j) * r_j
+    '''
+    order = np.argsort(states, kind="stable")
+    states, rewards = states[order], rewards[order]
+    starts = np.flatnonzero(np.r_[True, states[1:] != states[:-1]])
+    counts = np.diff(np.r_[starts, len(states)])
+    position = np.arange(len(states)) - np.repeat(starts, counts)
+    decay = 1 - epsilon
+    sums = np.add.reduceat(epsilon * decay ** (np.repeat(counts, counts) - 1 - position) * rewards, starts)
+    unique = states[starts]
+    values[unique] = decay ** counts * np.nan_to_num(values[unique]) + sums
+
+def train(player: str, n_games: int = 1_000_000, epsilon: float = 0.003, batch_size: int = 100_000, seed=None, values: np.ndarray = None) -> np.ndarray:
+    '''Values of player ("x" or "o") learned from n_games random games, played and learned batch_size at a time'''
+    rng = np.random.default_rng(seed)
+    values = new_values() if values is None else values
+    win, loss, draw = REWARDS[player]
+    mine = X if player == "x" else O
+    for start in range(0, n_games, batch_size):
+        codes, winners = random_games(rng, min(batch_size, n_games - start))
+        final_rewards = np.where(winners == EMPTY, draw, np.where(winners == mine, win, loss))
+        played = codes >= 0
+        # row-major order keeps the games in order and every game states in order, as the sequential training
+        update(values, CANONICAL[codes[played]], np.broadcast_to(final_rewards[:, None], codes.shape)[played].astype(float), epsilon)
+    return values
+
+def policy(values: np.ndarray, player: str) -> np.ndarray:
+    '''
+    Best cell of player in every position, as make_move: the move leading to the highest known value, the first cell in the order of
+    the magic numbers on ties, -1 if no move leads to a known position (make_move then plays at random)
+    '''
+    piece = X if player == "x" else O
+    # candidates in the order make_move scans the available moves: ascending magic number
+    cells = sorted(range(N_CELLS), key=MAGIC.__getitem__)
+    codes = np.arange(N_POSITIONS)
+    scores = np.full((N_POSITIONS, N_CELLS), -np.inf)
+    for column, cell in enumerate(cells):
+        free = CELLS[:, cell] == EMPTY
+        scores[free, column] = values[CANONICAL[codes[free] + piece * POWERS[cell]]]
+    scores = np.nan_to_num(scores, nan=-np.inf)
+    best = scores.argmax(axis=1)
+    return np.where(np.isfinite(scores[codes, best]), np.array(cells)[best], -1).astype(np.int8)
+
+def play(rng: np.random.Generator, n_games: int, policy_x: np.ndarray = None, policy_o: np.ndarray = None) -> np.ndarray:
+    '''Plays n_games at once, each side by its policy or at random if None. Returns the winner of every game (EMPTY for a draw)'''
+    codes = np.zeros(n_games, dtype=np.int64)
+    winners = np.zeros(n_games, dtype=np.int8)
+    active = np.ones(n_games, dtype=bool)
+    for ply in range(N_CELLS):
+        piece, table = (X, policy_x) if ply % 2 == 0 else (O, policy_o)
+        index = np.flatnonzero(active)
+        # a random free cell, the best one by the policy where it has one
+        noise = np.where(CELLS[codes[index]] == EMPTY, rng.random((len(index), N_CELLS)), -1.0)
+        cells = noise.argmax(axis=1)
+        if table is not None:
+            chosen = table[codes[index]]
+            cells = np.where(chosen >= 0, chosen, cells)
+        codes[index] += piece * POWERS[cells]
+        winners[index] = WINNER[codes[index]]
+        active[index] = winners[index] == EMPTY
+    return winners
+
+def save(path: str, values_x: np.ndarray, values_o: np.ndarray) -> None:
+    '''Both tables in one .npy file, X first'''
+    np.save(path, np.stack((values_x, values_o)))
+
+def load(path: str) -> tuple[np.ndarray, np.ndarray]:
+    '''Tables of a file written by save. Memory mapped: nothing is read until a value is needed'''
+    tables = np.load(path, mmap_mode="r")
+    return tables[0], tables[1]
+
+def counters(winners: np.ndarray, player: str) -> dict:
+    '''Results from the point of view of player, as the counters of the notebook'''
+    mine, theirs = (X, O) if player == "x" else (O, X)
+    return {"Wins": int((winners == mine).sum()), "Loses": int((winners == theirs).sum()), "Draws": int((winners == EMPTY).sum())}
+
+def format_counters(results: dict) -> str:
+    total = sum(results.values())
+    return ", ".join(f"{name}: {count} ({count / total * 100:.2f}%)" for name, count in results.items())
+
+def main(argv: list[str] = None) -> None:
+    '''Command line entry point: trains both players (or loads them) and repeats the experiments of the notebook'''
+    parser = argparse.ArgumentParser(description="Tic-tac-toe players learned from random games")
+    parser.add_argument("--games", type=int, default=1_000_000, help="training games of every player")
+    parser.add_argument("--epsilon", type=float, default=0.003)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--tests", type=int, default=10_000, help="games of every experiment")
+    parser.add_argument("--save", help=".npy file receiving the trained tables")
+    parser.add_argument("--load", help=".npy file of trained tables, no training")
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+    start = time.perf_counter()
+    if args.load:
+        values_x, values_o = load(args.load)
+    else:
+        values_x = train("x", args.games, args.epsilon, seed=rng)
+        values_o = train("o", args.games, args.epsilon, seed=rng)
+        if args.save:
+            save(args.save, values_x, values_o)
+    print(f"Tables ready in {time.perf_counter() - start:.2f} s")
+    policy_x, policy_o = policy(values_x, "x"), policy(values_o, "o")
+    print("AI using X against random moves: " + format_counters(counters(play(rng, args.tests, policy_x=policy_x), "x")))
+    print("AI using O against random moves: " + format_counters(counters(play(rng, args.tests, policy_o=policy_o), "o")))
+    results = counters(play(rng, args.tests, policy_x, policy_o), "o")
+    total = sum(results.values())
+    print(f'AI usign X Wins: {results["Loses"]} ({results["Loses"]/total*100:.2f}%), AI usign O Wins: {results["Wins"]} ({results["Wins"]/total*100:.2f}%), '
+          f'Draws: {results["Draws"]} ({results["Draws"]/total*100:.2f}%)')
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,131 @@
+import math
+import multiprocessing
 import random
-from copy import deepcopy
-from game import Game, Move, Player
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from bitboard import BitboardGame
+from evaluation import LineEvaluator
+from game import Game, Move, MOVES, Player
+from openingbook import DEFAULT_BOOK_PATH, open_book
+from searchstats import SearchStats
+from symmetry import INVERSE_SYMMETRIES, MOVE_SYMMETRIES
+from threats import SEGMENTS, after, forced_win, hot_lines, winner, winning_moves
+from transposition import EXACT, LOWER, UPPER, Replacement, TranspositionTable
+from zobrist import HORIZON_KEYS, MAXIMIZING_KEY, SIDE_KEYS
+
+class SearchTimeout(Exception):
+    '''Raised inside the search when the time budget of the move is over'''
+    pass
+
+# Process pool shared by every parallel AIPlayer, created on first use and kept alive between moves
+_pool = None
+_pool_workers = 0
+# best root score found so far by the running parallel search, written by every worker
+_shared_alpha = None
+# a pool serves one parallel search at a time, since the workers share a single bound
+_pool_lock = threading.Lock()
+# searchers living in each worker process, one per depth and evaluator, so their transposition tables survive between moves
+_worker_players = {}
+
+def _init_worker(shared_alpha) -> None:
+    '''Pool initializer: keeps the shared bound of the worker process'''
+    global _shared_alpha
+    _shared_alpha = shared_alpha
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    '''Returns the process pool of the parallel search, (re)creating it only if the number of workers changed'''
+    global _pool, _pool_workers, _shared_alpha
+    if _pool is None or _pool_workers != workers:
+        shutdown_pool()
+        _shared_alpha = multiprocessing.Value("d", float("-inf"))
+        _pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(_shared_alpha,))
+        _pool_workers = workers
+    return _pool
+
+def shutdown_pool() -> None:
+    '''Stops the worker processes of the parallel search'''
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown()
+    _pool, _pool_workers = None, 0
+
+def _search_root_move(first: int, second: int, player: int, history: list[int], code: int, depth: int, deadline: float | None, evaluator_args: tuple) -> float | None:
+    '''
+    Worker side of the parallel search: scores one root move, pruning with the best score the other workers found so far.
+    deadline is a time.time() value, since clocks like perf_counter are not comparable between processes.
+    evaluator_args are the arguments of the LineEvaluator, sent instead of its tables.
+    Returns None if the time budget ran out
+    '''
+    time_left = None if deadline is None else deadline - time.time()
+    if time_left is not None and time_left <= 0:
+        return None
+    searcher = _worker_players.get((depth, evaluator_args))
+    if searcher is None:
+        searcher = _worker_players[(depth, evaluator_args)] = AIPlayer(depth, evaluator=LineEvaluator(*evaluator_args), book_path=None)
+        searcher._same_depth_cutoffs = True
+    searcher.reset_search(depth, time_left)
+    searcher._root_depth = depth
+    game = BitboardGame.from_bitboards(first, second, player, history)
+    game.set_evaluator(searcher.evaluator)
+    game.push_code(code, player)
+    # just below the shared bound, so that a move as good as the best one still gets its exact score and ties go to the first move
+    alpha = math.nextafter(_shared_alpha.value, float("-inf"))
+    try:
+        score = searcher.minimax(game, depth - 1, alpha, float("inf"), False)
+    except SearchTimeout:
+        return None
+    with _shared_alpha.get_lock():
+        if score > _shared_alpha.value:
+            _shared_alpha.value = score
+    return score
 
 class AIPlayer(Player):
-    def __init__(self, max_depth: int) -> None:
+    # score of a position drawn by repetition or by length
+    DRAW_SCORE = 0
+
+    def __init__(self, max_depth: int, time_limit: float = None, workers: int = 1, tt_memory_mb: float = 64, replacement: Replacement = Replacement.DEPTH_PREFERRED, evaluator: LineEvaluator = None, book_path: str | None = DEFAULT_BOOK_PATH, ponder: bool = False, threats: bool = True) -> None:
+        '''
+        max_depth: depth of the search. If time_limit (seconds per move) is given, the search deepens iteratively up to max_depth
+        and returns the move of the deepest iteration completed within the budget.
+        workers: with more than one, root moves are split across a pool of processes. The transposition table then only cuts off
+        with results of the same depth, so the chosen move does not depend on which worker searched what first.
+        evaluator: scores the positions at the leaves, a LineEvaluator with the default weights if None.
+        book_path: opening book consulted before searching (see openingbook.py), if the file exists. None disables it.
+        The book is built with the default evaluator, so players with other weights do not consult it.
+        ponder: while the opponent thinks, a background thread searches our answer to its likely replies (see start_pondering).
+        It runs in this process, so it needs workers=1.
+        threats: decisive positions are answered before searching, with the forced wins within max_depth plies found by threats.forced_win,
+        and inside the search a node whose player can win at once is scored without searching its moves (see threat_move)
+        '''
         super().__init__()
+        if ponder and workers > 1:
+            raise ValueError("pondering needs workers=1")
         self.max_depth = max_depth
+        self.evaluator = LineEvaluator() if evaluator is None else evaluator
+        default = LineEvaluator()
+        default_evaluator = (self.evaluator.weights, self.evaluator.blocked_weight, self.evaluator.piece_weight) == (default.weights, default.blocked_weight, default.piece_weight)
+        self.book = None if book_path is None or not default_evaluator else open_book(book_path)
+        self.time_limit = time_limit
+        self.workers = workers
+        # cut off only with table results of the same depth, see minimax
+        self._same_depth_cutoffs = workers > 1
+        self._deadline = float("inf")
+        # move ordering heuristics, reset at every move: two killer moves per ply and a history score per (player, move code)
+        self._killers = []
+        self._history = []
+        self._root_depth = 0
+        # number of drawn positions met by the search, used to tell which results depend on the moves that led to them
+        self._draws_seen = 0
+        # shared by every search of this player, its counters are in self.transposition_table.stats()
+        self.transposition_table = TranspositionTable(tt_memory_mb, replacement)
+        # set to a SearchStats to collect a record of every move, see searchstats.py
+        self.stats: SearchStats | None = None
+        self.ponder = ponder
+        self.threats = threats
+        self._ponder_thread = None
+        # moves found by pondering, by (masks, move codes) of the position they answer
+        self._pondered = {}
         match max_depth:
             case 1:
                 self.name = "Dumb AI"
@@ -20,63 +140,347 @@ class AIPlayer(Player):
 
     def make_move(self, game: 'Game') -> tuple[tuple[int, int], Move]:
         """Wrapper that returns the best move for the AI player using the minimax algorithm"""
-        moves = game.get_possible_moves(game.get_current_player())
+        # the opponent has moved: pondering gives the search state back, keeping what it found
+        self.stop_pondering()
+        position = game
+        # search on a bitboard copy, moves are made and unmade in place on it, the game we were given is never touched
+        game = BitboardGame.from_game(game)
+        stats = self.stats
+        if stats is not None:
+            stats.start_search(self.max_depth, self.transposition_table)
+        move = None
+        # book moves are played at once, if they were searched at least as deep as this player would
+        if self.book is not None:
+            entry = self.book.probe(game)
+            if entry is not None and entry[1] >= self.max_depth:
+                move = entry[0]
+        from_book = move is not None
+        # the reply the opponent played was already searched while it was thinking
+        if move is None and self.ponder:
+            move = self._pondered.get((game.get_bitboards(), tuple(game.move_codes())))
+        # the search works on move codes, see MOVES
+        moves = game.get_possible_moves(game.get_current_player(), encoded=True)
+        if move is None and self.threats:
+            move, moves = self.threat_move(game, moves)
+        if move is None:
+            # the copy keeps the score of the evaluator up to date as the search makes and unmakes moves
+            game.set_evaluator(self.evaluator)
+            self.reset_search(self.max_depth, self.time_limit)
+            if self.time_limit is None:
+                move, _ = self.search_root(game, self.max_depth, moves)
+            else:
+                move = self.iterative_deepening(game, moves)
+            # if every move is a win/loss, return a random move
+            if move is None:
+                move = random.choice(moves)
+        if stats is not None:
+            stats.end_search(game.moves_made(), game.get_current_player(), self.max_depth, move, self.transposition_table, from_book)
+        if self.ponder:
+            self.start_pondering(position, move)
+        return MOVES[move]
+
+    def threat_move(self, game: BitboardGame, moves: list[int]) -> tuple[int | None, list[int]]:
+        """
+        Looks for a forced win within max_depth plies, the horizon of the search, so it plays as well as the search would, only sooner.
+        Returns its first move if found, None otherwise, with the moves worth searching: with max_depth >= 2 the search would score
+        -inf the moves that let the opponent win at its next move, so only the others are kept (all of them if none is left)
+        """
+        player = game.get_current_player()
+        first, second = game.get_bitboards()
+        move = forced_win(first, second, player, (self.max_depth + 1) // 2, game._repetition.copy())
+        if move is not None or self.max_depth < 2:
+            return move, moves
+        lines = hot_lines(first, second)[0]
+        repetition = game._repetition.copy()
+        safe = []
+        for code in moves:
+            new_first, new_second = after(first, second, player, code)
+            # player has no winning move, so a line completed by this move is one of the opponent
+            if winner(new_first, new_second, lines) != -1:
+                continue
+            # a draw ends the game before the opponent can win
+            drawn = repetition.push(code)
+            repetition.pop()
+            if drawn or not winning_moves(new_first, new_second, 1 - player, first_only=True):
+                safe.append(code)
+        return None, safe or moves
+
+    def start_pondering(self, game: 'Game', move: int) -> None:
+        """
+        Starts searching in the background the positions the opponent can reach after our move code, most likely replies first.
+        Results fill the transposition table and self._pondered until stop_pondering is called
+        """
+        game = BitboardGame.from_game(game)
+        player = game.get_current_player()
+        game.push_code(move, player)
+        if game.check_winner() != -1 or game.is_draw():
+            return
+        game.set_evaluator(self.evaluator)
+        opponent = 1 - player
+        # the expected reply is the best move of the opponent stored by the search that just ended, then the killers of that ply
+        position, symmetry = game.position_key()
+        key = position ^ SIDE_KEYS[opponent]
+        if game.moves_left() <= self.max_depth - 1:
+            key ^= HORIZON_KEYS[max(game.moves_left(), 0)]
+        entry = self.transposition_table.probe(key)
+        hint = None
+        if entry is not None and entry[4] is not None:
+            hint = MOVE_SYMMETRIES[INVERSE_SYMMETRIES[symmetry]][entry[4]]
+        replies = self.order_moves(game.get_possible_moves(opponent, encoded=True), opponent, 1, hint)
+        self._pondered = {}
+        # the deadline is only moved by stop_pondering from now on, the thread never resets it
+        self.reset_search(self.max_depth, None)
+        self._ponder_thread = threading.Thread(target=self._ponder, args=(game, player, replies), daemon=True)
+        self._ponder_thread.start()
+
+    def _ponder(self, game: BitboardGame, player: int, replies: list[int]) -> None:
+        """Body of the pondering thread: searches our answer to every reply in turn, until the replies end or the search is stopped"""
+        opponent = 1 - player
+        try:
+            for reply in replies:
+                game.push_code(reply, opponent)
+                if game.check_winner() == -1 and not game.is_draw():
+                    best_move, _ = self.search_root(game, self.max_depth, game.get_possible_moves(player, encoded=True))
+                    if best_move is not None:
+                        self._pondered[(game.get_bitboards(), tuple(game.move_codes()))] = best_move
+                game.pop()
+        except SearchTimeout:
+            pass
+
+    def stop_pondering(self) -> None:
+        """Interrupts the pondering thread, if any, and waits for it to leave the search"""
+        if self._ponder_thread is not None:
+            # the next node it visits raises SearchTimeout
+            self._deadline = float("-inf")
+            self._ponder_thread.join()
+            self._ponder_thread = None
+
+    def reset_search(self, max_depth: int, time_limit: float | None) -> None:
+        """Prepares a new search: starts the clock and clears the move ordering heuristics"""
+        self.transposition_table.new_search()
+        self._deadline = float("inf") if time_limit is None else time.perf_counter() + time_limit
+        self._killers = [[None, None] for _ in range(max_depth + 1)]
+        self._history = [0] * (2 * len(MOVES))
+
+    def iterative_deepening(self, game: 'Game', moves: list[int]) -> int | None:
+        """Searches one ply deeper at a time until the time budget runs out, returns the best move of the deepest completed iteration"""
+        best_move = None
+        for depth in range(1, self.max_depth + 1):
+            try:
+                move, score, scores = self.search_root(game, depth, moves, with_scores=True)
+            except SearchTimeout:
+                # the interrupted iteration is discarded, the game copy is thrown away with the moves still pushed on it
+                break
+            best_move = move
+            # next iteration starts from the principal variation, then from the most promising moves
+            moves = sorted(moves, key=lambda m: scores[m], reverse=True)
+            if move is not None:
+                moves.remove(move)
+                moves.insert(0, move)
+            # nothing left to discover once the game is decided
+            if score in (float("inf"), float("-inf")):
+                break
+        return best_move
+
+    def search_root(self, game: 'Game', depth: int, moves: list[int], with_scores: bool = False) -> tuple:
+        """
+        Searches every root move code to the given depth. Returns the first move with the best score and the score,
+        plus the score of every move if with_scores is set (moves that cannot beat the best have an upper bound as score)
+        """
+        if self.workers > 1 and len(moves) > 1:
+            return self.parallel_search_root(game, depth, moves, with_scores)
+        player = game.get_current_player()
+        self._root_depth = depth
+        if self.stats is not None:
+            self.stats.nodes[0] += 1
+            self.stats.expanded[0] += 1
+            self.stats.children[0] += len(moves)
         best_score = float("-inf")
         best_move = None
         alpha = float("-inf")
         beta = float("inf")
+        scores = {}
         for move in moves:
-            virtual_game = deepcopy(game)
             # ignoring acceptable return value supposing that get_possible_moves always returns the FULL list of valid moves
-            virtual_game.move(move[0], move[1], game.get_current_player())
-            score = self.minimax(virtual_game, self.max_depth-1, alpha, beta, False)
+            game.push_code(move, player)
+            score = self.minimax(game, depth-1, alpha, beta, False)
+            game.pop()
+            scores[move] = score
             if score > best_score:
                 best_score = score
                 best_move = move
-        if best_move:
-            return best_move
-        # if every move is a win/loss, return a random move
-        else:
-            return random.choice(moves)
+            # a move scoring at most the best one so far can only be found equal, not better, so it keeps the first best
+            alpha = max(alpha, score)
+        return (best_move, best_score, scores) if with_scores else (best_move, best_score)
+
+    def parallel_search_root(self, game: 'Game', depth: int, moves: list[int], with_scores: bool = False) -> tuple:
+        """
+        Same as search_root, but only the first move is searched here: once it gives a bound, the others are scored by the pool,
+        each worker pruning with the best score found so far by any of them
+        """
+        player = game.get_current_player()
+        self._root_depth = depth
+        first, second = game.get_bitboards()
+        history = game.move_codes()
+        # the eldest brother is searched alone to give the workers a bound from the start
+        game.push_code(moves[0], player)
+        scores = [self.minimax(game, depth-1, float("-inf"), float("inf"), False)]
+        game.pop()
+        with _pool_lock:
+            pool = get_pool(self.workers)
+            _shared_alpha.value = scores[0]
+            deadline = None if self._deadline == float("inf") else time.time() + self._deadline - time.perf_counter()
+            evaluator_args = (self.evaluator.weights, self.evaluator.blocked_weight, self.evaluator.piece_weight)
+            futures = [pool.submit(_search_root_move, first, second, player, history, move, depth, deadline, evaluator_args) for move in moves[1:]]
+            scores += [future.result() for future in futures]
+        if None in scores:
+            raise SearchTimeout
+        # first move with the best score, as in search_root
+        best_index = max(range(len(moves)), key=lambda i: (scores[i], -i))
+        best_move = moves[best_index] if scores[best_index] > float("-inf") else None
+        if with_scores:
+            return best_move, scores[best_index], dict(zip(moves, scores))
+        return best_move, scores[best_index]
+
+    def order_moves(self, moves: list[int], player: int, ply: int, hint: int | None, danger: int = 0) -> list[int]:
+        """
+        Orders the move codes: transposition table move first, then the killer moves of the ply, then by history score.
+        If danger has the cells of lines the opponent threatens to complete, the moves rewriting some of them come before all the others
+        """
+        history = self._history
+        offset = player * len(MOVES)
+        moves.sort(key=lambda move: history[offset + move], reverse=True)
+        for first in (*reversed(self._killers[ply]), hint):
+            if first is not None and first in moves:
+                moves.remove(first)
+                moves.insert(0, first)
+        if danger:
+            # stable: the order above holds among the moves that may block and among the others
+            moves.sort(key=lambda move: not SEGMENTS[move] & danger)
+        return moves
+
+    def record_cutoff(self, move: int, player: int, ply: int, depth: int) -> None:
+        """Remembers a move that caused a cutoff as a killer of its ply and rewards it in the history table"""
+        killers = self._killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self._history[player * len(MOVES) + move] += depth * depth
 
     def minimax(self, game: 'Game', depth: int, alpha: float, beta: float, maximizing: bool) -> float:
-        """Minimax algorithm with alpha-beta pruning"""
-        if depth == 0 or game.check_winner() != -1:
-            return self.evaluate(game)
+        """
+        Minimax algorithm with alpha-beta pruning and a transposition table. Every move is pushed on the game and popped back before returning.
+        Positions are looked up by their canonical (symmetry folded) hash, so the stored best move is kept in the canonical orientation
+        """
+        if time.perf_counter() > self._deadline:
+            raise SearchTimeout
+        stats = self.stats
+        if stats is not None:
+            stats.nodes[self._root_depth - depth] += 1
+        winner = game.check_winner()
+        if winner == -1 and game.is_draw():
+            self._draws_seen += 1
+            return self.DRAW_SCORE
+        if depth == 0 or winner != -1:
+            return self.evaluate(game, winner)
+        player = game.get_current_player() if maximizing else (game.get_current_player()+1)%2
+        # cells of the lines the opponent could complete with its next move, their moves are tried first
+        danger = 0
+        if self.threats:
+            first, second = game.get_bitboards()
+            hot = hot_lines(first, second)
+            # a player that can win at once gets the score of its win, none of its moves needs a search
+            if hot[0] and winning_moves(first, second, player, hot, first_only=True):
+                return float("inf") if maximizing else float("-inf")
+            danger = hot[2] if player == 0 else hot[1]
+        position, symmetry = game.position_key()
+        key = position ^ SIDE_KEYS[player] ^ (MAXIMIZING_KEY if maximizing else 0)
+        # close to the length limit the same position can be drawn in a subtree or not, depending on how many moves are left
+        moves_left = game.moves_left()
+        if moves_left <= depth:
+            key ^= HORIZON_KEYS[max(moves_left, 0)]
+        draws_seen = self._draws_seen
+        entry = self.transposition_table.probe(key)
+        hint = None
+        if entry is not None:
+            _, entry_depth, bound, value, canonical_move, _ = entry
+            # a result searched at least as deep can narrow the window or answer directly. The root-parallel search only uses
+            # results of the same depth, so that a value only depends on the position and the depth, never on what the table
+            # of a worker happened to contain, and the move does not depend on how the root moves were split
+            if entry_depth == depth or (entry_depth > depth and not self._same_depth_cutoffs):
+                if bound == EXACT:
+                    return value
+                elif bound == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if beta <= alpha:
+                    return value
+            # otherwise its best move is still the best guess to search first
+            if canonical_move is not None:
+                hint = MOVE_SYMMETRIES[INVERSE_SYMMETRIES[symmetry]][canonical_move]
+        ply = self._root_depth - depth
+        moves = self.order_moves(game.get_possible_moves(player, encoded=True), player, ply, hint, danger)
+        window_alpha, window_beta = alpha, beta
+        best_move = None
+        # number of moves searched, the loop stops right after the move that made beta <= alpha, if any
+        tried = 0
         if maximizing:
-            max_eval = float("-inf")
-            for from_pos, slide in game.get_possible_moves(game.get_current_player()):
-                new_game = deepcopy(game)
+            best_eval = float("-inf")
+            for tried, move in enumerate(moves, 1):
                 # ignoring acceptable return value supposing that get_possible_moves always returns the FULL list of valid moves
-                new_game.move(from_pos, slide, game.get_current_player())
-                eval = self.minimax(new_game, depth - 1, alpha, beta, False)
-                max_eval = max(max_eval, eval)
+                game.push_code(move, player)
+                eval = self.minimax(game, depth - 1, alpha, beta, False)
+                game.pop()
+                if eval > best_eval:
+                    best_eval, best_move = eval, move
                 alpha = max(alpha, eval)
                 if beta <= alpha:
+                    self.record_cutoff(move, player, ply, depth)
                     break
-            return max_eval
         else:
-            min_eval = float("inf")
-            for from_pos, slide in game.get_possible_moves((game.get_current_player()+1)%2):
-                new_game = deepcopy(game)
+            best_eval = float("inf")
+            for tried, move in enumerate(moves, 1):
                 # ignoring acceptable return value supposing that get_possible_moves always returns the FULL list of valid moves
-                new_game.move(from_pos, slide, ((game.get_current_player()+1)%2))
-                eval = self.minimax(new_game, depth - 1, alpha, beta, True)
-                min_eval = min(min_eval, eval)
+                game.push_code(move, player)
+                eval = self.minimax(game, depth - 1, alpha, beta, True)
+                game.pop()
+                if eval < best_eval:
+                    best_eval, best_move = eval, move
                 beta = min(beta, eval)
                 if beta <= alpha:
+                    self.record_cutoff(move, player, ply, depth)
                     break
-            return min_eval
+        if stats is not None:
+            stats.expanded[ply] += 1
+            stats.children[ply] += tried
+            if beta <= alpha:
+                stats.cutoffs[ply] += 1
+                stats.first_cutoffs[ply] += tried == 1
+        # the value is exact only if it fell inside the window it was searched with
+        bound = UPPER if best_eval <= window_alpha else LOWER if best_eval >= window_beta else EXACT
+        canonical_move = MOVE_SYMMETRIES[symmetry][best_move] if best_move is not None else None
+        # a subtree that met a repetition draw depends on the moves before this node, its result is not reusable elsewhere
+        if self._draws_seen == draws_seen:
+            self.transposition_table.store(key, depth, bound, best_eval, canonical_move)
+        return best_eval
 
-    def evaluate(self, game: Game) -> float:
-        """Evaluation function that returns the difference between the number of pieces of the AI player and the opponent player (if no winner is found)"""
+    def evaluate(self, game: Game, winner: int = None) -> float:
+        """
+        Evaluation function that returns the score of the evaluator from the AI player's point of view (if no winner is found).
+        winner is the result of game.check_winner() when the caller already knows it
+        """
         current_player = game.get_current_player()
         opponent_player = ((current_player + 1) % 2)
-        winner = game.check_winner()
+        if winner is None:
+            winner = game.check_winner()
         if winner == current_player:
             return float('inf') # AI player wins
         elif winner == opponent_player:
             return float('-inf') # Opponent wins
-        current_count = sum([1 for row in game.get_board() for piece in row if piece == current_player])
-        opponent_count = sum([1 for row in game.get_board() for piece in row if piece == opponent_player])
-        return current_count - opponent_count
\ No newline at end of file
+        # inside the search the game keeps the score itself, any other game is scored from scratch
+        if isinstance(game, BitboardGame) and game._evaluator is self.evaluator:
+            score = game.evaluation()
+        else:
+            score = self.evaluator.score(*BitboardGame.from_game(game).get_bitboards())
+        return score if current_player == 0 else -score
\ No newline at end of file
@@ -0,0 +1,201 @@
+import argparse
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+from collections import namedtuple
+import numpy as np
+from game import Game
+from tournament import PLAYER_SPECS, worker_player
+
+# Archive layout: the magic, then the games one after the other, each a fixed-size header followed by one byte per move (its code, see MOVES).
+# The offset of every game is appended to a sidecar index file (path + ".idx", little-endian uint64), so any game is found without a scan.
+# A game is written and flushed before its offset, so the index only lists complete games even if the writer is interrupted
+MAGIC = b"QXARCH01"
+OFFSET = struct.Struct("<Q")
+GAME_HEADER = struct.Struct("<BBbBI")  # player 1 id, player 2 id, winner (0, 1, 10 for a draw), number of moves, seed of the game
+# Player ids stored in the archive. Append only: the id of a player must never change
+PLAYER_IDS = ("random", "dumb", "weak", "strong", "godlike", "mcts")
+
+ArchivedGame = namedtuple("ArchivedGame", ["player_1", "player_2", "winner", "seed", "moves"])
+
+def index_path(path: str) -> str:
+    '''Path of the offset index of an archive'''
+    return path + ".idx"
+
+class ArchiveWriter(object):
+    '''Appends games to an archive, creating it if needed'''
+    def __init__(self, path: str) -> None:
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new:
+            with open(path, "rb") as file:
+                if file.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"{path} is not a game archive")
+            self._recover(path)
+        self.file = open(path, "ab")
+        self.index = open(index_path(path), "ab")
+        if new:
+            self.file.write(MAGIC)
+        self._offset = self.file.tell()
+
+    @staticmethod
+    def _recover(path: str) -> None:
+        '''Drops what an interrupted writer left after the last complete indexed game: a partial game or index entry'''
+        index = index_path(path)
+        offsets = np.fromfile(index, dtype="<u8", count=os.path.getsize(index) // OFFSET.size) if os.path.exists(index) else []
+        size, kept, end = os.path.getsize(path), len(offsets), len(MAGIC)
+        with open(path, "rb") as file:
+            while kept:
+                offset = int(offsets[kept - 1])
+                file.seek(offset)
+                header = file.read(GAME_HEADER.size)
+                if len(header) == GAME_HEADER.size and offset + GAME_HEADER.size + header[3] <= size:
+                    end = offset + GAME_HEADER.size + header[3]
+                    break
+                kept -= 1
+        os.truncate(path, end)
+        if os.path.exists(index):
+            os.truncate(index, kept * OFFSET.size)
+
+    def append(self, player_1: str, player_2: str, winner: int, moves: bytes, seed: int) -> None:
+        '''Appends a game: the names of its players, its result as returned by Game.play, its move codes and its seed'''
+        self.file.write(GAME_HEADER.pack(PLAYER_IDS.index(player_1), PLAYER_IDS.index(player_2), winner, len(moves), seed & 0xFFFFFFFF))
+        self.file.write(moves)
+        # the game is on disk before the index points to it
+        self.file.flush()
+        self.index.write(OFFSET.pack(self._offset))
+        self.index.flush()
+        self._offset += GAME_HEADER.size + len(moves)
+
+    def close(self) -> None:
+        self.file.close()
+        self.index.close()
+
+class GameArchive(object):
+    '''
+    Read-only view of an archive. Both files are memory mapped, so opening costs nothing and games are decoded only when asked for.
+    Supports len, indexing, slicing and iteration; headers() reads the fixed fields of every game at once
+    '''
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a game archive")
+        with open(index_path(path), "rb") as file:
+            self._index_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(index_path(path)) else None
+        offsets = np.zeros(0, dtype="<u8")
+        if self._index_map is not None:
+            offsets = np.frombuffer(self._index_map, dtype="<u8", count=len(self._index_map) // OFFSET.size)
+        # an interrupted writer can leave entries past the games written, offsets are increasing so those are the last ones
+        self.offsets = offsets[:np.searchsorted(offsets, len(self._map) - GAME_HEADER.size, side="right")]
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _game(self, offset: int) -> ArchivedGame:
+        player_1, player_2, winner, length, seed = GAME_HEADER.unpack_from(self._map, offset)
+        start = offset + GAME_HEADER.size
+        return ArchivedGame(PLAYER_IDS[player_1], PLAYER_IDS[player_2], winner, seed, self._map[start:start + length])
+
+    def __getitem__(self, item: int | slice) -> ArchivedGame | list[ArchivedGame]:
+        if isinstance(item, slice):
+            return [self._game(int(offset)) for offset in self.offsets[item]]
+        return self._game(int(self.offsets[item]))
+
+    def __iter__(self):
+        # sequential scan through the headers, the index is not needed
+        offset, end = len(MAGIC), len(self._map)
+        # a partial game left by an interrupted writer ends the scan
+        while offset + GAME_HEADER.size <= end and offset + GAME_HEADER.size + self._map[offset + 3] <= end:
+            game = self._game(offset)
+            yield game
+            offset += GAME_HEADER.size + len(game.moves)
+
+    def headers(self) -> dict[str, np.ndarray]:
+        '''Fixed fields of every game as arrays, gathered straight from the mapped bytes'''
+        data = np.frombuffer(self._map, dtype=np.uint8)
+        offsets = self.offsets.astype(np.int64)
+        seeds = np.zeros(len(offsets), dtype=np.uint32)
+        for byte in range(4):
+            seeds |= data[offsets + 4 + byte].astype(np.uint32) << (8 * byte)
+        return {
+            "player_1": data[offsets],
+            "player_2": data[offsets + 1],
+            "winner": data[offsets + 2].view(np.int8),
+            "length": data[offsets + 3],
+            "seed": seeds,
+        }
+
+    def replay(self, item: int, plies: int = None) -> Game:
+        '''
+        Replays game item through Game, up to plies moves if given. Player 0 moves first as in Game.play,
+        the current player of the returned game is the one to move, as when make_move is called
+        '''
+        moves = self[item].moves
+        plies = len(moves) if plies is None else plies
+        game = Game()
+        for ply, code in enumerate(moves[:plies]):
+            game.push_code(code, ply % 2)
+        game.current_player_idx = plies % 2
+        return game
+
+    def close(self) -> None:
+        # the index array views the mapping, it has to go first
+        self.offsets = None
+        if self._index_map is not None:
+            self._index_map.close()
+        self._map.close()
+
+def play_archived_game(task: tuple[str, str, int]) -> tuple[str, str, int, bytes, int]:
+    '''Plays a game between two player specs with a seed, returns what the archive stores of it'''
+    spec_1, spec_2, seed = task
+    random.seed(seed)
+    game = Game()
+    winner = game.play(worker_player(spec_1, 0), worker_player(spec_2, 1), False) # with interactive=False
+    return spec_1, spec_2, int(winner), bytes(game.move_codes()), seed
+
+def generate(path: str, pairings: list[tuple[str, str]], n_games: int, workers: int = 1, seed: int = 0, progress=None) -> int:
+    '''
+    Plays n_games across a pool of workers and appends each one to the archive as soon as it ends.
+    Game i is played by pairings[i % len(pairings)] with seed + i. Returns the number of games written
+    '''
+    tasks = ((*pairings[i % len(pairings)], seed + i) for i in range(n_games))
+    writer = ArchiveWriter(path)
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        results = pool.imap_unordered(play_archived_game, tasks, chunksize=16) if pool else map(play_archived_game, tasks)
+        for result in (progress(results, total=n_games) if progress else results):
+            writer.append(*result)
+    finally:
+        writer.close()
+        if pool:
+            pool.close()
+            pool.join()
+    return n_games
+
+def main(argv: list[str] = None) -> None:
+    '''Command line entry point: fills an archive with self-play games'''
+    parser = argparse.ArgumentParser(description="Self-play games written to a compact Quixo game archive")
+    parser.add_argument("--pair", nargs=2, action="append", metavar=("P1", "P2"), required=True, help="pairing of player specs, repeatable")
+    parser.add_argument("--games", type=int, default=1000, help="number of games")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game, game i uses seed + i")
+    parser.add_argument("--output", required=True, help="archive file, games are appended if it exists")
+    args = parser.parse_args(argv)
+    for pair in args.pair:
+        for spec in pair:
+            if spec not in PLAYER_SPECS or spec not in PLAYER_IDS:
+                parser.error(f"unknown player {spec}")
+    from tqdm import tqdm
+    generate(args.output, [tuple(pair) for pair in args.pair], args.games, args.workers, args.seed,
+             progress=lambda results, total: tqdm(results, total=total, unit="game"))
+    archive = GameArchive(args.output)
+    headers = archive.headers()
+    print(f"{len(archive)} games in {args.output}, {int(headers['length'].sum())} moves, "
+          f"{os.path.getsize(args.output) + os.path.getsize(index_path(args.output))} bytes")
+    archive.close()
+
+if __name__ == '__main__':
+    main()
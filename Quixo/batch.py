@@ -0,0 +1,152 @@
+import numpy as np
+from bitboard import BitboardGame, LINES, SLIDES
+from game import MOVES, RepetitionDetector
+
+# Per move code tables of bitboard.SLIDES, as arrays to index with a vector of codes
+TAKE = np.array([take for take, _, _, _, _ in SLIDES], dtype=np.int64)
+KEEP = np.array([keep for _, keep, _, _, _ in SLIDES], dtype=np.int64)
+SOURCE = np.array([source for _, _, source, _, _ in SLIDES], dtype=np.int64)
+# a slide shifts either left or right: one of the two amounts is always 0
+LEFT_SHIFT = np.array([max(shift, 0) for _, _, _, shift, _ in SLIDES], dtype=np.int64)
+RIGHT_SHIFT = np.array([max(-shift, 0) for _, _, _, shift, _ in SLIDES], dtype=np.int64)
+DEST = np.array([dest for _, _, _, _, dest in SLIDES], dtype=np.int64)
+LINE_MASKS = np.array(LINES, dtype=np.int64)
+
+# Draw rules of Game.play, see RepetitionDetector
+PATTERN_LENGTH = RepetitionDetector().pattern_length
+MAX_MOVES = RepetitionDetector().max_moves
+# A window of 10 move codes (< 64) is packed exactly in 60 bits, so repeated patterns are found with integer comparisons
+_CODE_BITS = 6
+
+def _winners(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    '''Winner of each pair of masks, as BitboardGame.check_winner'''
+    full_first = (first[:, None] & LINE_MASKS) == LINE_MASKS
+    full = full_first | ((second[:, None] & LINE_MASKS) == LINE_MASKS)
+    first_line = full.argmax(axis=1)
+    owner = np.where(full_first[np.arange(len(first)), first_line], 0, 1)
+    return np.where(full.any(axis=1), owner, -1)
+
+class BatchGame(object):
+    '''
+    Many Quixo games advanced in lockstep. Each game is a pair of 25-bit masks as in BitboardGame,
+    stored in two int64 arrays, and every operation works on the whole batch at once.
+    Player 0 moves first and players alternate, as in Game.play; winner is -1 while a game runs, 0 or 1 for a win, 10 for a draw
+    '''
+    def __init__(self, n_games: int) -> None:
+        self.first = np.zeros(n_games, dtype=np.int64)
+        self.second = np.zeros(n_games, dtype=np.int64)
+        self.current_player = np.zeros(n_games, dtype=np.int64)
+        self.n_moves = np.zeros(n_games, dtype=np.int64)
+        self.winner = np.full(n_games, -1, dtype=np.int64)
+        # codes of the moves made, and the packed window of PATTERN_LENGTH moves starting at each move
+        self.history = np.zeros((n_games, MAX_MOVES + 1), dtype=np.uint8)
+        self._windows = np.zeros((n_games, MAX_MOVES + 1), dtype=np.uint64)
+        self._last_window = np.zeros(n_games, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return len(self.first)
+
+    def running(self) -> np.ndarray:
+        '''Returns the mask of the games not finished yet'''
+        return self.winner == -1
+
+    def legal_mask(self) -> np.ndarray:
+        '''Returns an (N, 44) boolean array: move code j is possible in game i for the player to move'''
+        opponent = np.where(self.current_player == 0, self.second, self.first)
+        return (opponent[:, None] & TAKE[None, :]) == 0
+
+    def check_winner(self) -> np.ndarray:
+        '''Same as Game.check_winner for every game: the owner of the first complete line in row, column, diagonal order, or -1'''
+        return _winners(self.first, self.second)
+
+    def move(self, codes: np.ndarray) -> np.ndarray:
+        '''
+        Makes move codes[i] in game i for its player to move, as Game.move would.
+        Finished games and moves taking an opponent piece are left untouched. Returns the mask of the games that moved
+        '''
+        codes = np.asarray(codes, dtype=np.int64)
+        opponent = np.where(self.current_player == 0, self.second, self.first)
+        accepted = self.running() & ((opponent & TAKE[codes]) == 0)
+        index = np.flatnonzero(accepted)
+        self._move(index, codes[index])
+        return accepted
+
+    def _move(self, index: np.ndarray, codes: np.ndarray) -> None:
+        '''Makes legal moves in the running games index'''
+        keep, source, dest = KEEP[codes], SOURCE[codes], DEST[codes]
+        left, right = LEFT_SHIFT[codes], RIGHT_SHIFT[codes]
+        player = self.current_player[index]
+        # both masks slide the same way, then the taken cube lands on the border for the mover
+        first, second = self.first[index], self.second[index]
+        first = (first & keep) | (((first & source) << left) >> right) | np.where(player == 0, dest, 0)
+        second = (second & keep) | (((second & source) << left) >> right) | np.where(player == 1, dest, 0)
+        self.first[index], self.second[index] = first, second
+        self.current_player[index] = 1 - player
+        self._record(index, codes)
+        self._update_winner(index, first, second)
+
+    def _record(self, index: np.ndarray, codes: np.ndarray) -> None:
+        '''Appends the moves to the history and stores the window of the last PATTERN_LENGTH moves'''
+        n = self.n_moves[index]
+        self.history[index, n] = codes
+        n += 1
+        self.n_moves[index] = n
+        # shift register of the last moves: the oldest code drops out of the low bits, the new one enters the high bits
+        window = (self._last_window[index] >> np.uint64(_CODE_BITS)) | (codes.astype(np.uint64) << np.uint64(_CODE_BITS * (PATTERN_LENGTH - 1)))
+        self._last_window[index] = window
+        complete = n >= PATTERN_LENGTH
+        self._windows[index[complete], n[complete] - PATTERN_LENGTH] = window[complete]
+
+    def _update_winner(self, index: np.ndarray, first: np.ndarray, second: np.ndarray) -> None:
+        '''Sets the result of the games that just moved: a win first, then a draw by repeated pattern or by length'''
+        winner = _winners(first, second)
+        n = self.n_moves[index]
+        draw = n > MAX_MOVES
+        # as in check_repeated_pattern: the last window against every window starting before n - 2 * PATTERN_LENGTH,
+        # only games long enough can repeat
+        long_enough = np.flatnonzero(n > 2 * PATTERN_LENGTH)
+        if len(long_enough):
+            rows, n_long = index[long_enough], n[long_enough]
+            columns = int(n_long.max()) - 2 * PATTERN_LENGTH
+            eligible = np.arange(columns)[None, :] < (n_long - 2 * PATTERN_LENGTH)[:, None]
+            last = self._last_window[rows]
+            draw[long_enough] |= ((self._windows[rows, :columns] == last[:, None]) & eligible).any(axis=1)
+        self.winner[index] = np.where((winner == -1) & draw, 10, winner)
+
+    def random_moves(self, rng: np.random.Generator, index: np.ndarray = None) -> np.ndarray:
+        '''Draws a uniformly random possible move for every game, or for the games index'''
+        index = np.arange(len(self)) if index is None else index
+        opponent = np.where(self.current_player[index] == 0, self.second[index], self.first[index])
+        # rejection sampling: uniform codes, drawn again where they take an opponent piece. Usually most moves are possible,
+        # so a few rounds over the rejected games are much cheaper than a (N, 44) table of random keys
+        codes = rng.integers(0, len(MOVES), len(index))
+        rejected = np.flatnonzero(opponent & TAKE[codes])
+        for _ in range(32):
+            if not len(rejected):
+                return codes
+            codes[rejected] = rng.integers(0, len(MOVES), len(rejected))
+            rejected = rejected[(opponent[rejected] & TAKE[codes[rejected]]) != 0]
+        # the few unlucky ones left pick among their possible moves
+        if len(rejected):
+            legal = (opponent[rejected, None] & TAKE[None, :]) == 0
+            keys = rng.random(legal.shape)
+            keys[~legal] = -1.0
+            codes[rejected] = keys.argmax(axis=1)
+        return codes
+
+    def play_random(self, rng: np.random.Generator) -> np.ndarray:
+        '''Plays every running game to the end with random legal moves, returns the winners'''
+        index = np.flatnonzero(self.running())
+        while len(index):
+            self._move(index, self.random_moves(rng, index))
+            index = index[self.winner[index] == -1]
+        return self.winner
+
+    def to_game(self, i: int) -> BitboardGame:
+        '''Returns game i as a BitboardGame whose current player is the one to move, with its history for the draw rules'''
+        history = self.history[i, :self.n_moves[i]].tolist()
+        return BitboardGame.from_bitboards(int(self.first[i]), int(self.second[i]), int(self.current_player[i]), history)
+
+    def move_history(self, i: int) -> list:
+        '''Returns the (from_pos, slide) moves of game i'''
+        return [MOVES[code] for code in self.history[i, :self.n_moves[i]]]
@@ -0,0 +1,131 @@
+import argparse
+import json
+import platform
+import random
+import time
+from aiplayer import AIPlayer
+from bitboard import BitboardGame
+from game import Game
+from searchstats import SearchStats
+
+# Engines that can be measured on the same positions, by the name used on the command line
+BACKENDS = {"game": Game, "bitboard": BitboardGame}
+
+def seed_positions(n_positions: int = 8, plies: tuple[int, ...] = (4, 10, 16), seed: int = 0) -> list[list[int]]:
+    '''
+    Fixed benchmark positions as the move codes leading to them from the empty board: for each number of plies,
+    n_positions games of random possible moves, player 0 first. Games that end before are played again, so every position is still open
+    '''
+    rng = random.Random(seed)
+    positions = []
+    for n_plies in plies:
+        found = 0
+        while found < n_positions:
+            game = BitboardGame.from_bitboards(0, 0, 0)
+            codes = []
+            for ply in range(n_plies):
+                code = rng.choice(game.legal_codes(ply % 2))
+                game.push_code(code, ply % 2)
+                codes.append(code)
+                if game.check_winner() != -1 or game.is_draw():
+                    break
+            else:
+                positions.append(codes)
+                found += 1
+    return positions
+
+def build_position(backend: str, codes: list[int]) -> Game:
+    '''Replays the move codes of a position on a new game of the backend, the player to move is the current player'''
+    game = BACKENDS[backend]()
+    for ply, code in enumerate(codes):
+        game.push_code(code, ply % 2)
+    game.current_player_idx = len(codes) % 2
+    return game
+
+def _timed(function, repeat: int) -> float:
+    '''Seconds per call of function, the best of 3 rounds of repeat calls'''
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        best = min(best, time.perf_counter() - start)
+    return best / repeat
+
+def micro_benchmarks(backend: str, positions: list[list[int]], repeat: int = 200) -> list[dict]:
+    '''Times the basic operations of a backend on every position, one record per operation with the mean time per call'''
+    games = [build_position(backend, codes) for codes in positions]
+
+    def make_unmake():
+        # every possible move made with push (Game.move for the array backend) and reverted, on every position
+        for game in games:
+            player = game.get_current_player()
+            for code in game.get_possible_moves(player, encoded=True):
+                game.push_code(code, player)
+                game.pop()
+
+    operations = {
+        "check_winner": (lambda: [game.check_winner() for game in games], len(games)),
+        "get_possible_moves": (lambda: [game.get_possible_moves(game.get_current_player()) for game in games], len(games)),
+        "push_pop": (make_unmake, sum(len(game.get_possible_moves(game.get_current_player())) for game in games)),
+    }
+    records = []
+    for name, (function, calls) in operations.items():
+        seconds = _timed(function, repeat)
+        records.append({"kind": "micro", "backend": backend, "operation": name, "calls": calls, "seconds_per_call": seconds / calls, "calls_per_second": calls / seconds})
+    return records
+
+def search_benchmarks(positions: list[list[int]], depths: tuple[int, ...] = (1, 2, 3, 4)) -> list[dict]:
+    '''Full searches of AIPlayer at every depth on every position, fresh player each time and no opening book. One record per search'''
+    records = []
+    for depth in depths:
+        for index, codes in enumerate(positions):
+            player = AIPlayer(depth, book_path=None)
+            player.stats = SearchStats()
+            player.make_move(build_position("game", codes))
+            record = player.stats.records[-1]
+            records.append({"kind": "search", "position": index, "plies": len(codes), "depth": depth, **record})
+    return records
+
+def summarize_searches(records: list[dict]) -> list[dict]:
+    '''Totals of the search records by depth'''
+    summary = []
+    for depth in sorted({record["depth"] for record in records}):
+        rows = [record for record in records if record["depth"] == depth]
+        total_time = sum(row["time"] for row in rows)
+        total_nodes = sum(row["nodes"] for row in rows)
+        summary.append({"kind": "search_summary", "depth": depth, "searches": len(rows), "time": total_time,
+                        "nodes": total_nodes, "nodes_per_second": total_nodes / total_time if total_time > 0 else 0.0,
+                        "cutoff_rate": sum(row["cutoff_rate"] for row in rows) / len(rows),
+                        "tt_hit_rate": sum(row["tt_hit_rate"] for row in rows) / len(rows)})
+    return summary
+
+def main(argv: list[str] = None) -> None:
+    '''Command line entry point: prints a table and optionally writes every record as JSON lines'''
+    parser = argparse.ArgumentParser(description="Quixo engine benchmarks on fixed seed positions")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS), help="engines of the micro benchmarks")
+    parser.add_argument("--depths", nargs="+", type=int, default=[1, 2, 3, 4], help="depths of the search benchmarks")
+    parser.add_argument("--positions", type=int, default=4, help="positions per opening length")
+    parser.add_argument("--repeat", type=int, default=100, help="repetitions of every micro benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the positions")
+    parser.add_argument("--output", help="JSONL file receiving every record")
+    args = parser.parse_args(argv)
+    positions = seed_positions(args.positions, seed=args.seed)
+    records = [{"kind": "machine", "python": platform.python_version(), "machine": platform.machine(), "processor": platform.processor(), "seed": args.seed}]
+    for backend in args.backends:
+        for record in micro_benchmarks(backend, positions, args.repeat):
+            records.append(record)
+            print(f"{backend:>8} {record['operation']:>18}: {record['seconds_per_call']*1e6:9.2f} us/call")
+    searches = search_benchmarks(positions, tuple(args.depths))
+    records += searches
+    for row in summarize_searches(searches):
+        records.append(row)
+        print(f"depth {row['depth']}: {row['searches']} searches, {row['time']:.3f} s, {row['nodes_per_second']:.0f} nodes/s, "
+              f"cutoff rate {row['cutoff_rate']*100:.1f}%, TT hit rate {row['tt_hit_rate']*100:.1f}%")
+    if args.output:
+        with open(args.output, "w") as file:
+            for record in records:
+                file.write(json.dumps(record) + "\n")
+
+if __name__ == '__main__':
+    main()
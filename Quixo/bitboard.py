@@ -0,0 +1,245 @@
+import numpy as np
+from game import Game, Move, MOVES, MOVE_CODES, RepetitionDetector
+from zobrist import ROW_KEYS, fold, full_hash
+
+# Cell (x, y) is stored in bit y*5 + x, so a row is 5 contiguous bits and a column is every 5th bit
+FULL_MASK = (1 << 25) - 1
+
+def cell_bit(x: int, y: int) -> int:
+    '''Returns the mask of the single cell (x, y)'''
+    return 1 << (y * 5 + x)
+
+# The 12 winning lines, in the same order Game.check_winner scans them: rows, columns, principal and secondary diagonal
+LINES: tuple[int, ...] = (
+    tuple(sum(cell_bit(x, y) for x in range(5)) for y in range(5))
+    + tuple(sum(cell_bit(x, y) for y in range(5)) for x in range(5))
+    + (sum(cell_bit(i, i) for i in range(5)), sum(cell_bit(4 - i, i) for i in range(5)))
+)
+
+def _slide_masks(from_pos: tuple[int, int], slide: Move) -> tuple[int, int, int, int, int]:
+    '''
+    Precomputes how a move rewrites the board.
+    Returns (taken cell, cells kept untouched, cells that shift, shift amount, cell where the taken piece lands)
+    '''
+    x, y = from_pos
+    if slide == Move.LEFT:
+        # columns 0..x-1 of row y move one step right, the piece lands in column 0
+        segment = sum(cell_bit(i, y) for i in range(0, x + 1))
+        source, shift, dest = segment & ~cell_bit(x, y), 1, cell_bit(0, y)
+    elif slide == Move.RIGHT:
+        # columns x+1..4 of row y move one step left, the piece lands in column 4
+        segment = sum(cell_bit(i, y) for i in range(x, 5))
+        source, shift, dest = segment & ~cell_bit(x, y), -1, cell_bit(4, y)
+    elif slide == Move.TOP:
+        # rows 0..y-1 of column x move one step down, the piece lands in row 0
+        segment = sum(cell_bit(x, i) for i in range(0, y + 1))
+        source, shift, dest = segment & ~cell_bit(x, y), 5, cell_bit(x, 0)
+    else:
+        # rows y+1..4 of column x move one step up, the piece lands in row 4
+        segment = sum(cell_bit(x, i) for i in range(y, 5))
+        source, shift, dest = segment & ~cell_bit(x, y), -5, cell_bit(x, 4)
+    return cell_bit(x, y), FULL_MASK & ~segment, source, shift, dest
+
+# One entry per move code, see MOVES
+SLIDES = tuple(_slide_masks(from_pos, slide) for from_pos, slide in MOVES)
+# The border cells with the codes of the moves that start from them, so legality is tested once per cell
+CELL_MOVES: tuple[tuple[int, tuple[int, ...]], ...] = tuple(
+    (cell_bit(x, y), tuple(code for code, (from_pos, _) in enumerate(MOVES) if from_pos == (x, y)))
+    for x in range(5) for y in range(5)
+    if any(from_pos == (x, y) for from_pos, _ in MOVES)
+)
+# Cells whose owner decides which moves are possible
+BORDER_MASK = sum(bit for bit, _ in CELL_MOVES)
+# Opponent pieces on the border -> codes of the possible moves. Filled as patterns show up, there are at most 2^16 of them
+_LEGAL_CODES: dict[int, tuple[int, ...]] = {}
+# Rows rewritten by each move, the only ones whose hash has to be updated, as (keys of the row, shift of the row)
+HASH_ROWS: tuple[tuple[tuple[list[int], int], ...], ...] = tuple(
+    tuple((ROW_KEYS[row], row * 5) for row in range(5) if (FULL_MASK & ~keep) >> (row * 5) & 31) for _, keep, _, _, _ in SLIDES
+)
+# Template used to expand the masks into the same array Game.get_board returns
+_EMPTY_BOARD = np.ones((5, 5), dtype=np.uint8) * -1
+
+class BitboardGame(Game):
+    '''
+    Quixo game that stores the pieces of each player as a 25-bit integer mask instead of a 5x5 array.
+    Moves, legality and winner checks become a handful of mask operations, while the public interface is the one of Game
+    '''
+    def __init__(self) -> None:
+        # the board lives in the masks only, there is no array to initialize
+        self._bitboards = [0, 0]
+        self.current_player_idx = 1
+        self._undo_stack = []
+        self.move_history = []
+        self._repetition = RepetitionDetector()
+        self.stats = None
+        # packed Zobrist hash of the position under the 8 symmetries, see zobrist.py. The empty board hashes to 0
+        self._hash = 0
+        # line evaluator kept up to date by the moves, and the sum of its line scores. See set_evaluator
+        self._evaluator = None
+        self._line_score = 0
+
+    @classmethod
+    def from_game(cls, game: Game) -> 'BitboardGame':
+        '''Builds a bitboard copy of any game'''
+        if isinstance(game, BitboardGame):
+            new_game = cls()
+            new_game._bitboards = list(game._bitboards)
+        else:
+            board = game.get_board()
+            new_game = cls()
+            for player_id in (0, 1):
+                new_game._bitboards[player_id] = sum(
+                    cell_bit(x, y) for y in range(5) for x in range(5) if board[y, x] == player_id
+                )
+        new_game._hash = full_hash(*new_game._bitboards)
+        new_game.current_player_idx = game.get_current_player()
+        # the moves already played count for draws in the copy too
+        new_game._repetition = game._repetition.copy()
+        return new_game
+
+    @classmethod
+    def from_bitboards(cls, first: int, second: int, current_player_idx: int, history: list[int] = ()) -> 'BitboardGame':
+        '''Builds a game from the masks of player 0 and player 1 and the codes of the moves that led there, used for draws'''
+        new_game = cls()
+        new_game._bitboards = [first, second]
+        new_game._hash = full_hash(first, second)
+        new_game.current_player_idx = current_player_idx
+        for code in history:
+            new_game._repetition.push(code)
+        return new_game
+
+    def get_bitboards(self) -> tuple[int, int]:
+        '''
+        Returns the masks of player 0 and player 1, the compact form of the board to send to other processes
+        '''
+        return self._bitboards[0], self._bitboards[1]
+
+    def get_board(self) -> np.ndarray:
+        '''
+        Returns the board
+        '''
+        board = _EMPTY_BOARD.copy()
+        for player_id, mask in enumerate(self._bitboards):
+            while mask:
+                low = mask & -mask
+                cell = low.bit_length() - 1
+                board[cell // 5, cell % 5] = player_id
+                mask ^= low
+        return board
+
+    def board_view(self) -> np.ndarray:
+        '''
+        Returns a read-only snapshot of the board. The masks are the real storage, so unlike Game it does not follow later moves
+        '''
+        board = self.get_board()
+        board.flags.writeable = False
+        return board
+
+    def position_key(self) -> tuple[int, int]:
+        '''
+        Returns the Zobrist hash of the position folded to its canonical orientation,
+        together with the symmetry that maps the position onto the canonical one
+        '''
+        return fold(self._hash)
+
+    def set_evaluator(self, evaluator) -> None:
+        '''
+        Attaches an evaluation.LineEvaluator: from now on every move updates the score of the lines it rewrites,
+        and evaluation() costs a lookup. None detaches it
+        '''
+        self._evaluator = evaluator
+        self._line_score = 0 if evaluator is None else evaluator.line_score(*self._bitboards)
+
+    def evaluation(self) -> float:
+        '''Score of the attached evaluator from player 0's point of view, pieces are counted on the spot (see count_pieces)'''
+        return self._line_score + self._evaluator.piece_weight * (self._bitboards[0].bit_count() - self._bitboards[1].bit_count())
+
+    def count_pieces(self, player_id: int) -> int:
+        '''
+        Returns the number of pieces owned by the specified player
+        '''
+        return self._bitboards[player_id].bit_count()
+
+    def check_winner(self) -> int:
+        '''Check the winner. Returns the player ID of the winner if any, otherwise returns -1'''
+        first, second = self._bitboards
+        for line in LINES:
+            if first & line == line:
+                return 0
+            if second & line == line:
+                return 1
+        return -1
+
+    def move(self, from_pos: tuple[int, int], slide: Move, player_id: int) -> bool:
+        '''Perform a move'''
+        code = MOVE_CODES.get((tuple(from_pos), slide))
+        if code is None or player_id not in (0, 1):
+            return False
+        # the taken piece must be neutral or already owned by the player
+        if self._bitboards[1 - player_id] & SLIDES[code][0]:
+            return False
+        self._apply(code, player_id)
+        return True
+
+    def push(self, move: tuple[tuple[int, int], Move], player_id: int = None) -> bool:
+        '''
+        Performs a move in place so that it can be reverted with pop. If player_id is None the current player moves.
+        Returns False, leaving the game untouched, if the move is not acceptable
+        '''
+        code = MOVE_CODES.get((tuple(move[0]), move[1]))
+        return code is not None and self.push_code(code, player_id)
+
+    def push_code(self, code: int, player_id: int = None) -> bool:
+        '''Same as push, with the move given by its code (see MOVES)'''
+        player_id = self.current_player_idx if player_id is None else player_id
+        if player_id not in (0, 1) or self._bitboards[1 - player_id] & SLIDES[code][0]:
+            return False
+        self._undo_stack.append((self._bitboards[0], self._bitboards[1], self._hash, self._line_score))
+        self._apply(code, player_id)
+        self._repetition.push(code)
+        return True
+
+    def pop(self) -> None:
+        '''Reverts the last move performed with push'''
+        self._bitboards[0], self._bitboards[1], self._hash, self._line_score = self._undo_stack.pop()
+        self._repetition.pop()
+
+    def _apply(self, code: int, player_id: int) -> None:
+        '''Applies a move already known to be legal'''
+        _, keep, source, shift, dest = SLIDES[code]
+        mine, other = self._bitboards[player_id], self._bitboards[1 - player_id]
+        if shift > 0:
+            mine = (mine & keep) | ((mine & source) << shift) | dest
+            other = (other & keep) | ((other & source) << shift)
+        else:
+            mine = (mine & keep) | ((mine & source) >> -shift) | dest
+            other = (other & keep) | ((other & source) >> -shift)
+        old_first, old_second = self._bitboards
+        self._bitboards[player_id], self._bitboards[1 - player_id] = mine, other
+        # update the hash with the rows the slide rewrote
+        first, second = self._bitboards
+        for keys, row_shift in HASH_ROWS[code]:
+            # see zobrist.row_content, inlined since this runs at every node of the search
+            self._hash ^= (keys[((old_first >> row_shift) & 31) | (((old_second >> row_shift) & 31) << 5)]
+                           ^ keys[((first >> row_shift) & 31) | (((second >> row_shift) & 31) << 5)])
+        if self._evaluator is not None:
+            # same for the score of the lines crossing the slid segment
+            line_score = self._line_score
+            for line, table in self._evaluator.updates[code]:
+                line_score += table[(first & line) | ((second & line) << 25)] - table[(old_first & line) | ((old_second & line) << 25)]
+            self._line_score = line_score
+
+    def legal_codes(self, player: int) -> tuple[int, ...]:
+        '''Returns the codes of the possible moves for the specified player. The tuple is shared, nothing is built per call'''
+        opponent = self._bitboards[(player + 1) % 2] & BORDER_MASK
+        codes = _LEGAL_CODES.get(opponent)
+        if codes is None:
+            codes = _LEGAL_CODES[opponent] = tuple(
+                code for bit, cell_codes in CELL_MOVES if not opponent & bit for code in cell_codes
+            )
+        return codes
+
+    def get_possible_moves(self, player: int, encoded: bool = False) -> list[tuple[tuple[int, int], Move]] | list[int]:
+        """Returns a list of possible moves for the specified player, or their codes (see MOVES) if encoded is set"""
+        codes = self.legal_codes(player)
+        return list(codes) if encoded else [MOVES[code] for code in codes]
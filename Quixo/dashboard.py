@@ -0,0 +1,54 @@
+import os
+import numpy as np
+from rich import box, print
+from rich.align import Align
+from rich.console import Console
+from rich.layout import Layout
+from rich.panel import Panel
+from rich.table import Table
+from rich.text import Text
+from game import Player
+
+# Terminal UI of the interactive games. Kept apart from the engine so that importing game does not load rich
+
+def print_board(board: np.ndarray):
+    '''Prints the board. -1 are neutral pieces, 0 are pieces of player 0, 1 pieces of player 1'''
+    print(board)
+
+def print_dashboard(board: np.ndarray, player1: Player, player2: Player, move_history_p1: str, move_history_p2: str):
+    '''Prints the board and move history'''
+    fixed_console = Console(height=20)
+    main_layout = Layout()
+    main_layout.split_column(Layout(name="first_row", size=4), Layout(name="second_row"))
+    main_layout["second_row"].split_row(Layout(name="left_column",ratio=2), Layout(name="right_column",ratio=5))
+    main_layout["right_column"].split_column(Layout(name="right_column_top"), Layout(name="right_column_bottom"))
+    os.system('cls' if os.name == 'nt' else 'clear')
+    table = Table(show_header=False, box=box.ROUNDED, border_style="bold white", show_lines=True, title="Game Board", title_style="bold white")
+    # Add columns for each column in the board
+    for _ in range(board.shape[1]):
+        table.add_column(width=2)
+    # Fill the table with values from the board
+    for row in board:
+        row_data = ["🔴" if cell == 0 else "🟣" if cell == 1 else "" for cell in row]
+        table.add_row(*row_data)
+    main_layout["first_row"].update(Align.center(Panel(f"You're playing as {'[red]🔴 first[/red]' if player1.name == 'Human' else '[violet]🟣 second[/violet]'} against {player1.name if player1.name != 'Human' else player2.name}", title="Game Recap", style="bold white")))
+    main_layout["left_column"].update(table)
+    main_layout["right_column_top"].update(Panel(move_history_p1, style="bold white", title="Player 1 Move History"))
+    main_layout["right_column_bottom"].update(Panel(move_history_p2, style="bold white", title="Player 2 Move History"))
+    fixed_console.print(main_layout)
+    print("")
+
+def print_winner(winner: int, winner_player: Player):
+    console = Console()
+    if winner == 10:
+        message = "It's a draw!"
+        style = "bold yellow"
+    elif winner == 0 and winner_player.name == "Human":
+        message = "You won! Congratulations! 🎉"
+        style = "bold green"
+    else:
+        message = "Unfortunately you lost!"
+        style = "bold red"
+    styled_message = Text(message, style=style, justify="center")
+    console.print(Panel(styled_message, title="GAME ENDED!", style=style, expand=True))
+    console.print("")
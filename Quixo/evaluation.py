@@ -0,0 +1,62 @@
+from bitboard import LINES, SLIDES, FULL_MASK
+
+# Each line is read as 5 base-3 digits, one per cell from the lowest bit: 0 neutral, 1 player 0, 2 player 1
+N_PATTERNS = 3 ** 5
+
+def _line_cells(line: int) -> tuple[int, ...]:
+    '''Masks of the 5 cells of a line, lowest bit first'''
+    return tuple(1 << bit for bit in range(25) if line >> bit & 1)
+
+# Lines rewritten by each move code: those crossing a cell of the slid segment, the only ones whose score can change
+AFFECTED_LINES: tuple[tuple[int, ...], ...] = tuple(
+    tuple(i for i, line in enumerate(LINES) if line & (FULL_MASK & ~keep)) for _, keep, _, _, _ in SLIDES
+)
+
+class LineEvaluator(object):
+    '''
+    Scores a position line by line from player 0's point of view.
+    A line holding k pieces of a single player is worth weights[k] to that player, a line holding pieces of both is worth blocked_weight
+    to the player with more pieces on it (nothing if they have as many), and every piece is worth piece_weight. Swapping the players
+    negates every score, so the evaluation stays the same for whoever is searching. The score of each line is looked up in a 243-entry pattern table,
+    so BitboardGame can keep the total up to date as moves are made and unmade (see BitboardGame.set_evaluator)
+    '''
+    def __init__(self, weights: tuple[float, ...] = (0, 0, 1, 2, 4, 8), blocked_weight: float = 0, piece_weight: float = 1) -> None:
+        if len(weights) != 6:
+            raise ValueError("weights needs one value per number of pieces on a line, from 0 to 5")
+        self.weights = tuple(weights)
+        self.blocked_weight = blocked_weight
+        self.piece_weight = piece_weight
+        self.pattern_table = tuple(self._pattern_score(index) for index in range(N_PATTERNS))
+        # the same table keyed by the masked pieces of a line, (first & line) | (second & line) << 25, so a lookup needs no digit extraction
+        self.line_tables: tuple[dict[int, float], ...] = tuple(self._line_table(line) for line in LINES)
+        # (line, table) pairs to update after each move code
+        self.updates: tuple[tuple[tuple[int, dict[int, float]], ...], ...] = tuple(
+            tuple((LINES[i], self.line_tables[i]) for i in lines) for lines in AFFECTED_LINES
+        )
+
+    def _pattern_score(self, index: int) -> float:
+        '''Score of a pattern for player 0'''
+        digits = [(index // 3 ** i) % 3 for i in range(5)]
+        first, second = digits.count(1), digits.count(2)
+        if first and second:
+            # the same for both players, as the other terms
+            return self.blocked_weight * ((first > second) - (first < second))
+        return self.weights[first] - self.weights[second]
+
+    def _line_table(self, line: int) -> dict[int, float]:
+        '''Pattern table of a line keyed by its masked pieces'''
+        cells = _line_cells(line)
+        table = {}
+        for index in range(N_PATTERNS):
+            first = sum(cell for i, cell in enumerate(cells) if (index // 3 ** i) % 3 == 1)
+            second = sum(cell for i, cell in enumerate(cells) if (index // 3 ** i) % 3 == 2)
+            table[first | (second << 25)] = self.pattern_table[index]
+        return table
+
+    def line_score(self, first: int, second: int) -> float:
+        '''Sum of the line scores of the masks of player 0 and player 1, from scratch'''
+        return sum(table[(first & line) | ((second & line) << 25)] for line, table in zip(LINES, self.line_tables))
+
+    def score(self, first: int, second: int) -> float:
+        '''Score of the masks of player 0 and player 1 from scratch, from player 0's point of view'''
+        return self.line_score(first, second) + self.piece_weight * (first.bit_count() - second.bit_count())
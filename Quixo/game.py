@@ -1,15 +1,8 @@
 from abc import ABC, abstractmethod
 from copy import deepcopy
 from enum import Enum
-import os
+import time
 import numpy as np
-from rich import box, print
-from rich.align import Align
-from rich.console import Console
-from rich.layout import Layout
-from rich.panel import Panel
-from rich.table import Table
-from rich.text import Text
 
 class Move(Enum):
     '''
@@ -20,6 +13,122 @@ class Move(Enum):
     LEFT = 2
     RIGHT = 3
 
+def _border_moves() -> tuple[tuple[tuple[int, int], Move], ...]:
+    '''Lists every (from_pos, slide) pair allowed by the rules, in the same order as Game.get_possible_moves'''
+    moves = []
+    for x in range(0, 5):
+        for y in range(0, 5):
+            # corners can be pushed along the two sides they belong to
+            if (x, y) == (0, 0):
+                moves += [((x, y), Move.BOTTOM), ((x, y), Move.RIGHT)]
+            elif (x, y) == (0, 4):
+                moves += [((x, y), Move.TOP), ((x, y), Move.RIGHT)]
+            elif (x, y) == (4, 0):
+                moves += [((x, y), Move.BOTTOM), ((x, y), Move.LEFT)]
+            elif (x, y) == (4, 4):
+                moves += [((x, y), Move.TOP), ((x, y), Move.LEFT)]
+            # the other border cubes can be pushed in every direction but towards their own side
+            elif y == 0:
+                moves += [((x, y), Move.BOTTOM), ((x, y), Move.LEFT), ((x, y), Move.RIGHT)]
+            elif x == 0:
+                moves += [((x, y), Move.TOP), ((x, y), Move.BOTTOM), ((x, y), Move.RIGHT)]
+            elif y == 4:
+                moves += [((x, y), Move.TOP), ((x, y), Move.LEFT), ((x, y), Move.RIGHT)]
+            elif x == 4:
+                moves += [((x, y), Move.TOP), ((x, y), Move.BOTTOM), ((x, y), Move.LEFT)]
+    return tuple(moves)
+
+# The 44 moves of the game. The index of a move in this tuple is its compact integer code
+MOVES = _border_moves()
+MOVE_CODES = {move: code for code, move in enumerate(MOVES)}
+# Board index (row, column) of the cube taken by each move, to test the legality of all the moves at once
+_MOVE_ROWS = np.array([y for (x, y), _ in MOVES])
+_MOVE_COLUMNS = np.array([x for (x, y), _ in MOVES])
+
+class RepetitionDetector(object):
+    '''
+    Incremental version of Game.check_draw over a stream of move codes: the game is a draw when the last pattern_length moves
+    already appeared as a block ending before them, or when more than max_moves moves were made.
+    Every window of pattern_length moves is kept as a rolling hash, so a move costs O(1) instead of a scan of the history.
+    Moves can be taken back with pop, so the search can use it too
+    '''
+    _BASE = 131
+    _MODULUS = (1 << 61) - 1
+
+    def __init__(self, pattern_length: int = 10, max_moves: int = 60) -> None:
+        self.pattern_length = pattern_length
+        self.max_moves = max_moves
+        self._moves = []
+        # _prefix[i] is the hash of the first i moves
+        self._prefix = [0]
+        # hash of the windows that may be repeated -> their start indexes
+        self._windows = {}
+        # whether the game was a draw after each move, and the hash of the window each move made eligible
+        self._draws = []
+        self._added = []
+        self._base_power = pow(self._BASE, pattern_length, self._MODULUS)
+
+    def __len__(self) -> int:
+        return len(self._moves)
+
+    def copy(self) -> 'RepetitionDetector':
+        '''Returns an independent copy'''
+        new_detector = RepetitionDetector(self.pattern_length, self.max_moves)
+        new_detector._moves = list(self._moves)
+        new_detector._prefix = list(self._prefix)
+        new_detector._windows = {key: list(starts) for key, starts in self._windows.items()}
+        new_detector._draws = list(self._draws)
+        new_detector._added = list(self._added)
+        return new_detector
+
+    def moves(self) -> list[int]:
+        '''Returns the codes of the moves made so far'''
+        return list(self._moves)
+
+    def _window_hash(self, start: int) -> int:
+        return (self._prefix[start + self.pattern_length] - self._prefix[start] * self._base_power) % self._MODULUS
+
+    def push(self, code: int) -> bool:
+        '''Adds a move. Returns True if the game is now a draw'''
+        moves = self._moves
+        moves.append(code)
+        self._prefix.append((self._prefix[-1] * self._BASE + code + 1) % self._MODULUS)
+        n, k = len(moves), self.pattern_length
+        repeated = False
+        added = None
+        if n >= 2 * k:
+            # as in check_repeated_pattern, a window starting at i can match the last one once n - 2k > i:
+            # window n - 2k - 1 just became eligible
+            start = n - 2 * k - 1
+            if start >= 0:
+                added = self._window_hash(start)
+                self._windows.setdefault(added, []).append(start)
+            last = n - k
+            # equal hashes are double checked on the moves themselves, it only happens when the game ends
+            for candidate in self._windows.get(self._window_hash(last), ()):
+                if moves[candidate:candidate + k] == moves[last:]:
+                    repeated = True
+                    break
+        self._added.append(added)
+        self._draws.append(repeated or n > self.max_moves)
+        return self._draws[-1]
+
+    def pop(self) -> None:
+        '''Takes back the last move'''
+        added = self._added.pop()
+        if added is not None:
+            starts = self._windows[added]
+            starts.pop()
+            if not starts:
+                del self._windows[added]
+        self._moves.pop()
+        self._prefix.pop()
+        self._draws.pop()
+
+    def is_draw(self) -> bool:
+        '''Returns True if the game is a draw after the last move'''
+        return bool(self._draws) and self._draws[-1]
+
 class Player(ABC):
     def __init__(self) -> None:
         '''You can change this for your player if you need to handle state/have memory'''
@@ -40,6 +149,14 @@ class Game(object):
     def __init__(self) -> None:
         self._board = np.ones((5, 5), dtype=np.uint8) * -1
         self.current_player_idx = 1
+        # what push needs to revert each move, the last one on top
+        self._undo_stack = []
+        # (player, (from_pos, slide)) of every move accepted by play
+        self.move_history = []
+        # draw detection over the moves made with push
+        self._repetition = RepetitionDetector()
+        # set to a searchstats.PlayStats to time every ply of play
+        self.stats = None
 
     def get_board(self) -> np.ndarray:
         '''
@@ -47,15 +164,55 @@ class Game(object):
         '''
         return deepcopy(self._board)
 
+    def board_view(self) -> np.ndarray:
+        '''
+        Returns a read-only view of the board, without copying it. It follows the game as moves are made
+        '''
+        view = self._board.view()
+        view.flags.writeable = False
+        return view
+
     def get_current_player(self) -> int:
         '''
         Returns the current player
         '''
-        return deepcopy(self.current_player_idx)
+        # ints are immutable, there is nothing to copy
+        return self.current_player_idx
+
+    def count_pieces(self, player_id: int) -> int:
+        '''
+        Returns the number of pieces owned by the specified player
+        '''
+        return int(np.count_nonzero(self._board == player_id))
+
+    def is_draw(self) -> bool:
+        '''
+        Returns True if the moves made with push make the game a draw, see check_draw
+        '''
+        return self._repetition.is_draw()
+
+    def moves_made(self) -> int:
+        '''
+        Returns the number of moves made with push
+        '''
+        return len(self._repetition)
+
+    def moves_left(self) -> int:
+        '''
+        Returns how many more moves can be made with push before the game is drawn by length
+        '''
+        return self._repetition.max_moves + 1 - len(self._repetition)
+
+    def move_codes(self) -> list[int]:
+        '''
+        Returns the codes (see MOVES) of the moves made with push
+        '''
+        return self._repetition.moves()
 
     def print(self):
         '''Prints the board. -1 are neutral pieces, 0 are pieces of player 0, 1 pieces of player 1'''
-        print(self._board)
+        from dashboard import print_board
+        print_board(self.get_board())
 
     def check_winner(self) -> int:
         '''Check the winner. Returns the player ID of the winner if any, otherwise returns -1'''
@@ -91,27 +248,31 @@ class Game(object):
         '''Play the game. Returns the winning player, if any. For draws return value is 10'''
         players = [player1, player2]
         winner = -1
-        move_history = []
+        move_history = self.move_history
+        # dashboard strings, extended by one move at a time instead of being joined again every turn
+        history_strings = {player1: "", player2: ""}
         while winner < 0:
             self.current_player_idx += 1
             self.current_player_idx %= len(players)
             ok = False
-            self.print_dashboard(player1, player2,
-                                " | ".join([" ".join(map(str, move[1])) for move in move_history if move[0] == player1]),
-                                " | ".join([" ".join(map(str, move[1])) for move in move_history if move[0] == player2])
-                                ) if interactive else None
+            self.print_dashboard(player1, player2, history_strings[player1], history_strings[player2]) if interactive else None
+            stats = self.stats
+            start = time.perf_counter() if stats is not None else None
+            rejected = 0
             while not ok:
                 from_pos, slide = players[self.current_player_idx].make_move(self)
-                ok = self.move(from_pos, slide, self.current_player_idx)
-            move_history.append((players[self.current_player_idx],(from_pos, slide)))
+                ok = self.push((from_pos, slide), self.current_player_idx)
+                rejected += not ok
+            if stats is not None:
+                stats.add(len(move_history), self.current_player_idx, time.perf_counter() - start, rejected)
+            player = players[self.current_player_idx]
+            move_history.append((player,(from_pos, slide)))
+            history_strings[player] += (" | " if history_strings[player] else "") + " ".join(map(str, (from_pos, slide)))
             winner = self.check_winner()
             if winner == -1: # if no winner is found
-                winner = self.check_draw([move[1] for move in move_history]) # Exclude the information regarding who made that move. If draw found return 10 else still -1
+                winner = 10 if self.is_draw() else -1 # push keeps track of repeated patterns and of the number of moves
             if winner >= 0 and interactive:
-                self.print_dashboard(player1, player2,
-                                    " | ".join([" ".join(map(str, move[1])) for move in move_history if move[0] == player1]),
-                                    " | ".join([" ".join(map(str, move[1])) for move in move_history if move[0] == player2])
-                                    ) if interactive else None
+                self.print_dashboard(player1, player2, history_strings[player1], history_strings[player2]) if interactive else None
                 self.print_winner(winner, player1 if winner == 0 else player2)
         return winner
 
@@ -128,6 +289,34 @@ class Game(object):
                 self._board[(from_pos[1], from_pos[0])] = deepcopy(prev_value)
         return acceptable
 
+    def push(self, move: tuple[tuple[int, int], Move], player_id: int = None) -> bool:
+        '''
+        Performs a move in place so that it can be reverted with pop. If player_id is None the current player moves.
+        Returns False, leaving the game untouched, if the move is not acceptable
+        '''
+        from_pos, slide = move
+        player_id = self.current_player_idx if player_id is None else player_id
+        if (tuple(from_pos), slide) not in MOVE_CODES:
+            return False
+        # a slide only rewrites the row or the column of the taken piece
+        line = (from_pos[1], slice(None)) if slide in (Move.LEFT, Move.RIGHT) else (slice(None), from_pos[0])
+        saved = self._board[line].copy()
+        if not self.move(from_pos, slide, player_id):
+            return False
+        self._undo_stack.append((line, saved))
+        self._repetition.push(MOVE_CODES[(tuple(from_pos), slide)])
+        return True
+
+    def push_code(self, code: int, player_id: int = None) -> bool:
+        '''Same as push, with the move given by its code (see MOVES)'''
+        return self.push(MOVES[code], player_id)
+
+    def pop(self) -> None:
+        '''Reverts the last move performed with push'''
+        line, saved = self._undo_stack.pop()
+        self._board[line] = saved
+        self._repetition.pop()
+
     def __take(self, from_pos: tuple[int, int], player_id: int) -> bool:
         '''Take piece'''
         # acceptable only if in border
@@ -226,44 +415,11 @@ class Game(object):
                 self._board[(self._board.shape[0] - 1, from_pos[1])] = piece
         return acceptable
 
-    def get_possible_moves(self, player: int) -> list[tuple[tuple[int, int], Move]]:
-        """Returns a list of possible moves for the specified player"""
-        moves = []
-        for x in range(0,5):
-            for y in range(0,5):
-                # if cube is different from the other player.
-                if self.get_board()[(y, x)] != ((player+1)%2):
-                    match (x, y):
-                        case (0, 0):
-                            moves.append(((x, y), Move.BOTTOM))
-                            moves.append(((x, y), Move.RIGHT))
-                        case (0, 4):
-                            moves.append(((x, y), Move.TOP))
-                            moves.append(((x, y), Move.RIGHT))
-                        case (4, 0):
-                            moves.append(((x, y), Move.BOTTOM))
-                            moves.append(((x, y), Move.LEFT))
-                        case (4, 4):
-                            moves.append(((x, y), Move.TOP))
-                            moves.append(((x, y), Move.LEFT))
-                        case _:
-                            if y == 0:
-                                moves.append(((x, y), Move.BOTTOM))
-                                moves.append(((x, y), Move.LEFT))
-                                moves.append(((x, y), Move.RIGHT))
-                            elif x == 0:
-                                moves.append(((x, y), Move.TOP))
-                                moves.append(((x, y), Move.BOTTOM))
-                                moves.append(((x, y), Move.RIGHT))
-                            elif y == 4:
-                                moves.append(((x, y), Move.TOP))
-                                moves.append(((x, y), Move.LEFT))
-                                moves.append(((x, y), Move.RIGHT))
-                            elif x == 4:
-                                moves.append(((x, y), Move.TOP))
-                                moves.append(((x, y), Move.BOTTOM))
-                                moves.append(((x, y), Move.LEFT))
-        return moves
+    def get_possible_moves(self, player: int, encoded: bool = False) -> list[tuple[tuple[int, int], Move]] | list[int]:
+        """Returns a list of possible moves for the specified player, or their codes (see MOVES) if encoded is set"""
+        # a move is possible if the cube it takes is different from the other player
+        codes = np.flatnonzero(self._board[_MOVE_ROWS, _MOVE_COLUMNS] != ((player+1)%2)).tolist()
+        return codes if encoded else [MOVES[code] for code in codes]
 
     def check_draw(self, move_history: list) -> int:
         '''Check if the game is a draw. Returns 10 otherwise still -1'''
@@ -283,38 +439,10 @@ class Game(object):
 
     def print_dashboard(self, player1: Player, player2: Player, move_history_p1: str, move_history_p2: str):
         '''Prints the board and move history'''
-        fixed_console = Console(height=20)
-        main_layout = Layout()
-        main_layout.split_column(Layout(name="first_row", size=4), Layout(name="second_row"))
-        main_layout["second_row"].split_row(Layout(name="left_column",ratio=2), Layout(name="right_column",ratio=5))
-        main_layout["right_column"].split_column(Layout(name="right_column_top"), Layout(name="right_column_bottom"))
-        os.system('cls' if os.name == 'nt' else 'clear')
-        table = Table(show_header=False, box=box.ROUNDED, border_style="bold white", show_lines=True, title="Game Board", title_style="bold white")
-        # Add columns for each column in the board
-        for _ in range(self._board.shape[1]):
-            table.add_column(width=2)
-        # Fill the table with values from the board
-        for row in self._board:
-            row_data = ["🔴" if cell == 0 else "🟣" if cell == 1 else "" for cell in row]
-            table.add_row(*row_data)
-        main_layout["first_row"].update(Align.center(Panel(f"You're playing as {'[red]🔴 first[/red]' if player1.name == 'Human' else '[violet]🟣 second[/violet]'} against {player1.name if player1.name != 'Human' else player2.name}", title="Game Recap", style="bold white")))
-        main_layout["left_column"].update(table)
-        main_layout["right_column_top"].update(Panel(move_history_p1, style="bold white", title="Player 1 Move History"))
-        main_layout["right_column_bottom"].update(Panel(move_history_p2, style="bold white", title="Player 2 Move History"))
-        fixed_console.print(main_layout)
-        print("")
+        # the UI stack is only loaded once a dashboard is shown, see dashboard.py
+        from dashboard import print_dashboard
+        print_dashboard(self.get_board(), player1, player2, move_history_p1, move_history_p2)
 
     def print_winner(self, winner: int, winner_player: Player):
-        console = Console()
-        if winner == 10:
-            message = "It's a draw!"
-            style = "bold yellow"
-        elif winner == 0 and winner_player.name == "Human":
-            message = "You won! Congratulations! 🎉"
-            style = "bold green"
-        else:
-            message = "Unfortunately you lost!"
-            style = "bold red"
-        styled_message = Text(message, style=style, justify="center")
-        console.print(Panel(styled_message, title="GAME ENDED!", style=style, expand=True))
-        console.print("")
\ No newline at end of file
+        from dashboard import print_winner
+        print_winner(winner, winner_player)
@@ -1,5 +1,11 @@
-from menu import QuixoMenu
+import sys
 
 if __name__ == '__main__':
-    menu = QuixoMenu()
-    menu.main_menu()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        # headless mode, e.g. python main.py --p1 strong --p2 random --games 1000: a tournament that never loads the UI stack
+        from tournament import main
+        main()
+    else:
+        from menu import QuixoMenu
+        menu = QuixoMenu()
+        menu.main_menu()
\ No newline at end of file
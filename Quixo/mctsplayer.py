@@ -0,0 +1,185 @@
+import math
+import random
+import time
+from aiplayer import get_pool
+from bitboard import BitboardGame
+from game import Game, Move, MOVES, Player
+
+class Node(object):
+    '''Node of the search tree: the position reached by playing code from the parent position'''
+    __slots__ = ("code", "parent", "children", "untried", "visits", "wins", "player", "winner")
+
+    def __init__(self, code: int | None, parent: 'Node | None', player: int, winner: int = -1) -> None:
+        self.code = code
+        self.parent = parent
+        self.children = []
+        # codes not expanded yet, in random order. Generated when the node is first selected
+        self.untried = None
+        self.visits = 0
+        # results of the playouts for the player who moved into this node: 1 for a win, 0.5 for a draw
+        self.wins = 0.0
+        # player to move
+        self.player = player
+        # -1 while the game goes on, 0 or 1 for a win, 10 for a draw
+        self.winner = winner
+
+# trees living in each worker process, by (slot, player to move), so they are reused between moves as the one of the player
+_worker_players = {}
+
+def _search_worker(slot: int, first: int, second: int, player: int, history: list[int], playouts: int | None, deadline: float | None, seed: int, exploration: float) -> dict[int, tuple[int, float]]:
+    '''
+    Worker side of the parallel search: grows the tree of the slot with its own random playouts and returns the statistics of the root moves.
+    deadline is a time.time() value, since clocks like perf_counter are not comparable between processes
+    '''
+    searcher = _worker_players.get((slot, player))
+    if searcher is None:
+        searcher = _worker_players[(slot, player)] = MCTSPlayer(exploration=exploration)
+    searcher.exploration = exploration
+    game = BitboardGame.from_bitboards(first, second, player, history)
+    searcher.advance_root(game)
+    local_deadline = None if deadline is None else time.perf_counter() + deadline - time.time()
+    searcher.search(game, playouts, local_deadline, random.Random(seed))
+    return searcher.root_stats()
+
+class MCTSPlayer(Player):
+    def __init__(self, playouts: int | None = 1000, time_limit: float = None, exploration: float = math.sqrt(2), workers: int = 1) -> None:
+        '''
+        Monte Carlo Tree Search with the UCT selection rule.
+        playouts: playouts per move, time_limit: seconds per move. The search stops at the first budget that runs out, at least one must be given.
+        exploration: constant of the exploration term of UCT.
+        workers: with more than one, every worker grows its own tree with a share of the playouts and the root statistics are summed
+        '''
+        super().__init__()
+        if playouts is None and time_limit is None:
+            raise ValueError("MCTSPlayer needs a playout budget or a time limit")
+        self.playouts = playouts
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.workers = workers
+        # tree kept between moves: its root, with the position and the move codes that lead to it
+        self._root = None
+        self._root_bitboards = None
+        self._root_history = []
+        self.name = "MCTS AI"
+
+    def make_move(self, game: 'Game') -> tuple[tuple[int, int], Move]:
+        """Grows the search tree from the current position and plays the most visited move"""
+        game = BitboardGame.from_game(game)
+        player = game.get_current_player()
+        self.advance_root(game)
+        deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        futures = []
+        playouts = self.playouts
+        if self.workers > 1:
+            # the budget is split evenly, this process grows its own tree as one of the workers
+            playouts = None if self.playouts is None else -(-self.playouts // self.workers)
+            pool = get_pool(self.workers)
+            first, second = game.get_bitboards()
+            history = game.move_codes()
+            wall_deadline = None if deadline is None else time.time() + self.time_limit
+            futures = [pool.submit(_search_worker, slot, first, second, player, history, playouts, wall_deadline, random.getrandbits(64), self.exploration)
+                       for slot in range(1, self.workers)]
+        self.search(game, playouts, deadline, random)
+        stats = self.root_stats()
+        for future in futures:
+            for code, (visits, wins) in future.result().items():
+                own_visits, own_wins = stats.get(code, (0, 0.0))
+                stats[code] = (own_visits + visits, own_wins + wins)
+        if not stats:
+            # not even one playout fit in the budget
+            return MOVES[random.choice(game.legal_codes(player))]
+        # most visited move, the most successful one among equals
+        best = max(stats, key=lambda code: stats[code])
+        return MOVES[best]
+
+    def advance_root(self, game: BitboardGame) -> None:
+        """Moves the root of the tree down to the position of the game along the moves played since the last search, or starts a new tree"""
+        history = game.move_codes()
+        player = game.get_current_player()
+        root = self._root
+        known = len(self._root_history)
+        if root is not None and history[:known] == self._root_history:
+            # replay the new moves on the old root to check that they really lead to this position
+            replay = BitboardGame.from_bitboards(*self._root_bitboards, root.player)
+            for code in history[known:]:
+                mover = root.player
+                root = next((child for child in root.children if child.code == code), None)
+                if root is None or not replay.push_code(code, mover):
+                    root = None
+                    break
+            if root is not None and replay.get_bitboards() != game.get_bitboards():
+                root = None
+        if root is None or root.player != player:
+            root = Node(None, None, player)
+        # the rest of the old tree is unreachable from now on and gets freed
+        root.parent = None
+        self._root, self._root_bitboards, self._root_history = root, game.get_bitboards(), history
+
+    def search(self, game: BitboardGame, playouts: int | None, deadline: float | None, rng) -> None:
+        """
+        Runs selection, expansion, playout and backpropagation from the root until a budget runs out.
+        deadline is a time.perf_counter() value, rng anything with choice and shuffle (the random module or a random.Random)
+        """
+        root = self._root
+        done = 0
+        while (playouts is None or done < playouts) and (deadline is None or time.perf_counter() < deadline):
+            node = root
+            depth = 0
+            # selection down to a node with unexpanded moves, or to the end of the game
+            while node.winner == -1:
+                if node.untried is None:
+                    node.untried = list(game.legal_codes(node.player))
+                    rng.shuffle(node.untried)
+                if node.untried:
+                    # expansion of one move
+                    code = node.untried.pop()
+                    game.push_code(code, node.player)
+                    depth += 1
+                    winner = game.check_winner()
+                    if winner == -1 and game.is_draw():
+                        winner = 10
+                    child = Node(code, node, 1 - node.player, winner)
+                    node.children.append(child)
+                    node = child
+                    break
+                node = self.select(node)
+                game.push_code(node.code, 1 - node.player)
+                depth += 1
+            result = node.winner if node.winner != -1 else self.playout(game, node.player, rng)
+            # backpropagation, every node is scored for the player who moved into it
+            while node is not None:
+                node.visits += 1
+                if result == 10:
+                    node.wins += 0.5
+                elif result != node.player:
+                    node.wins += 1
+                node = node.parent
+            for _ in range(depth):
+                game.pop()
+            done += 1
+
+    def select(self, node: Node) -> Node:
+        """Returns the child with the highest UCT score. Every child has been visited at least once when it was expanded"""
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        return max(node.children, key=lambda child: child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits))
+
+    def playout(self, game: BitboardGame, player: int, rng) -> int:
+        """Plays random possible moves until the game ends, then reverts them. Returns the winner, 10 for a draw"""
+        depth = 0
+        while True:
+            game.push_code(rng.choice(game.legal_codes(player)), player)
+            depth += 1
+            winner = game.check_winner()
+            if winner == -1 and game.is_draw():
+                winner = 10
+            if winner != -1:
+                break
+            player = 1 - player
+        for _ in range(depth):
+            game.pop()
+        return winner
+
+    def root_stats(self) -> dict[int, tuple[int, float]]:
+        """Returns (visits, wins) of every move expanded at the root, by move code"""
+        return {child.code: (child.visits, child.wins) for child in self._root.children}
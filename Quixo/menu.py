@@ -12,13 +12,15 @@ from tqdm import tqdm
 from aiplayer import AIPlayer
 from game import Game
 from human import HumanPlayer
+from mctsplayer import MCTSPlayer
 from randomplayer import RandomPlayer
+from tournament import SPEC_BY_NAME, iter_tournament, wilson_interval
 
 class QuixoMenu():
     def __init__(self) -> None:
         self.console = Console()
         self.main_content = ["Play against AI", "Evaluate AIs", "Credits", "Exit"]
-        self.evaluate_content = ["Random", "Dumb AI", "Weak AI", "Strong AI", "GODLIKE AI", "Back to Main Menu"]
+        self.evaluate_content = ["Random", "Dumb AI", "Weak AI", "Strong AI", "GODLIKE AI", "MCTS AI", "Back to Main Menu"]
         self.play_against_ai_content = ["First", "Second", "Back to Main Menu"]
         self.counters = {"Player 1 Wins": 0, "Player 2 Wins": 0, "Draws": 0}
         self.PLAYER_1 = None
@@ -46,12 +48,13 @@ class QuixoMenu():
             self.N_GAMES = self.select_n_games()
             self.reset_counters()
             self.evaluation_recap()
-            for x in tqdm(range(self.N_GAMES), desc="Evaluating AIs", unit="game"):
-                game = Game()
-                winner = game.play(self.PLAYER_1, self.PLAYER_2, False) # with interactive=False
-                if winner == 0:
+            # games are sharded across every core, the first selected player always moves first
+            results = iter_tournament(SPEC_BY_NAME[self.PLAYER_1.name], SPEC_BY_NAME[self.PLAYER_2.name], self.N_GAMES,
+                                      workers=os.cpu_count(), swap_colours=False)
+            for record in tqdm(results, total=self.N_GAMES, desc="Evaluating AIs", unit="game"):
+                if record["winner"] == 0:
                     self.counters["Player 1 Wins"] += 1
-                elif winner == 1:
+                elif record["winner"] == 1:
                     self.counters["Player 2 Wins"] += 1
                 else: #elif winner == 10
                     self.counters["Draws"] += 1
@@ -91,8 +94,11 @@ class QuixoMenu():
         # GODLIKE AI
         elif selection == self.evaluate_content[4]:
             return AIPlayer(max_depth=4)
-        # Back to Main Menu
+        # MCTS AI
         elif selection == self.evaluate_content[5]:
+            return MCTSPlayer(playouts=1000)
+        # Back to Main Menu
+        elif selection == self.evaluate_content[6]:
             return None
         # Just in case
         else:
@@ -143,6 +149,7 @@ class QuixoMenu():
         table.add_column("Draws", justify="center", style="yellow")
         table.add_column("Total Games", justify="center", style="bright_blue")
         table.add_column("Win Percentage", justify="center", style="bold green")
+        table.add_column("95% CI", justify="center", style="green")
         table.add_row(
             self.PLAYER_1.name,
             str(self.counters['Player 1 Wins']),
@@ -150,6 +157,7 @@ class QuixoMenu():
             str(self.counters['Draws']),
             str(self.N_GAMES),
             f"{self.counters['Player 1 Wins']/self.N_GAMES*100:.1f}%",
+            "{:.1f}-{:.1f}%".format(*(bound*100 for bound in wilson_interval(self.counters['Player 1 Wins'], self.N_GAMES))),
         )
         table.add_row(
             self.PLAYER_2.name,
@@ -158,6 +166,7 @@ class QuixoMenu():
             str(self.counters['Draws']),
             str(self.N_GAMES),
             f"{self.counters['Player 2 Wins']/self.N_GAMES*100:.1f}%",
+            "{:.1f}-{:.1f}%".format(*(bound*100 for bound in wilson_interval(self.counters['Player 2 Wins'], self.N_GAMES))),
         )
         self.console.print("")
         self.console.print(Align.center(table))
@@ -181,9 +190,15 @@ class QuixoMenu():
             if self.PLAYER_1 is None:
                 return self.main_menu()
             self.PLAYER_2 = HumanPlayer()
+        # the AI thinks on the human's time, see AIPlayer.start_pondering
+        ai_player = self.PLAYER_2 if human_turn == self.play_against_ai_content[0] else self.PLAYER_1
+        if isinstance(ai_player, AIPlayer):
+            ai_player.ponder = True
         self.display_message_with_timer(4)
         game = Game()
         game.play(self.PLAYER_1, self.PLAYER_2, True) # with interactive=True
+        if isinstance(ai_player, AIPlayer):
+            ai_player.stop_pondering()
 
     def choose_human_turn(self):
         """Choose if you want to play as first or second in the play against AI section"""
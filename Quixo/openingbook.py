@@ -0,0 +1,169 @@
+import argparse
+import mmap
+import multiprocessing
+import os
+import struct
+from bitboard import BitboardGame
+from symmetry import INVERSE_SYMMETRIES, MOVE_SYMMETRIES
+from zobrist import SIDE_KEYS
+
+# File layout: a fixed header, then one fixed-size record per position sorted by key, so a lookup is a binary search on the mapped file
+MAGIC = b"QXOBOOK1"
+HEADER = struct.Struct("<8sIHH")  # magic, number of records, plies covered, depth of the search
+RECORD = struct.Struct("<QBBxxf")  # key, best move code in the canonical orientation, depth of the search, score
+_KEY = struct.Struct("<Q")
+
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+
+def book_key(game: BitboardGame) -> tuple[int, int]:
+    '''Key of the position and the player to move, the same for every symmetric position, and the symmetry that leads to the canonical one'''
+    position, symmetry = game.position_key()
+    return position ^ SIDE_KEYS[game.get_current_player()], symmetry
+
+class OpeningBook(object):
+    '''
+    Read-only view of a book file. The file is memory mapped: nothing is read at startup,
+    lookups only touch the pages they need, and every process mapping the same file shares them through the page cache
+    '''
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.plies, self.depth = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or len(self._map) != HEADER.size + self.count * RECORD.size:
+            self._map.close()
+            raise ValueError(f"{path} is not an opening book")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _find(self, key: int) -> int | None:
+        '''Index of the record of the key, by binary search'''
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            middle_key = _KEY.unpack_from(self._map, HEADER.size + middle * RECORD.size)[0]
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def probe(self, game: BitboardGame) -> tuple[int, int, float] | None:
+        '''Returns (move code in the orientation of the game, depth, score) if the position is in the book and its move is possible'''
+        key, symmetry = book_key(game)
+        index = self._find(key)
+        if index is None:
+            return None
+        _, canonical_move, depth, score = RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size)
+        move = MOVE_SYMMETRIES[INVERSE_SYMMETRIES[symmetry]][canonical_move]
+        # a key collision could point to a move that is not even possible here
+        if move not in game.legal_codes(game.get_current_player()):
+            return None
+        return move, depth, score
+
+    def close(self) -> None:
+        self._map.close()
+
+# books opened by this process, by path, so every player reuses the same mapping. A missing file is not remembered,
+# so a book built later by this process is found
+_open_books = {}
+
+def open_book(path: str) -> OpeningBook | None:
+    '''Returns the book of a path, mapping it on first use, or None if there is no book there'''
+    if path not in _open_books:
+        if not os.path.exists(path):
+            return None
+        _open_books[path] = OpeningBook(path)
+    return _open_books[path]
+
+def opening_positions(plies: int) -> list[tuple[int, int, int]]:
+    '''
+    Positions (player 0 mask, player 1 mask, player to move) reachable in fewer than plies moves from the empty board,
+    player 0 moving first as in Game.play. Symmetric positions are kept once
+    '''
+    game = BitboardGame.from_bitboards(0, 0, 0)
+    seen = {book_key(game)[0]}
+    frontier = [game.get_bitboards()]
+    positions = [(0, 0, 0)]
+    for ply in range(plies - 1):
+        player = ply % 2
+        next_frontier = []
+        for first, second in frontier:
+            game = BitboardGame.from_bitboards(first, second, player)
+            for code in game.legal_codes(player):
+                game.push_code(code, player)
+                game.current_player_idx = 1 - player
+                key = book_key(game)[0]
+                # positions already won are not worth a book entry
+                if key not in seen and game.check_winner() == -1:
+                    seen.add(key)
+                    next_frontier.append(game.get_bitboards())
+                    positions.append((*game.get_bitboards(), 1 - player))
+                game.current_player_idx = player
+                game.pop()
+        frontier = next_frontier
+    return positions
+
+# searchers of the builder processes, one per depth
+_builder_players = {}
+
+def search_position(task: tuple[int, int, int, int]) -> tuple[int, int, float] | None:
+    '''Searches a position (player 0 mask, player 1 mask, player to move, depth), returns its record (key, canonical move, score) or None if every move loses'''
+    from aiplayer import AIPlayer
+    first, second, player, depth = task
+    searcher = _builder_players.get(depth)
+    if searcher is None:
+        searcher = _builder_players[depth] = AIPlayer(depth, book_path=None)
+    game = BitboardGame.from_bitboards(first, second, player)
+    game.set_evaluator(searcher.evaluator)
+    searcher.reset_search(depth, None)
+    move, score = searcher.search_root(game, depth, game.get_possible_moves(player, encoded=True))
+    if move is None:
+        return None
+    key, symmetry = book_key(game)
+    return key, MOVE_SYMMETRIES[symmetry][move], score
+
+def write_book(path: str, records: list[tuple[int, int, float]], plies: int, depth: int) -> None:
+    '''Writes records (key, canonical move, score) sorted by key'''
+    records = sorted(records)
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(records), plies, depth))
+        for key, move, score in records:
+            file.write(RECORD.pack(key, move, depth, score))
+
+def build_book(path: str, plies: int, depth: int, workers: int = 1, progress=None) -> int:
+    '''Deep-searches every opening position of fewer than plies moves and writes the book. Returns the number of positions stored'''
+    tasks = [(first, second, player, depth) for first, second, player in opening_positions(plies)]
+    if workers <= 1:
+        results = map(search_position, tasks)
+    else:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap_unordered(search_position, tasks)
+    records = []
+    try:
+        for result in (progress(results, total=len(tasks)) if progress else results):
+            if result is not None:
+                records.append(result)
+    finally:
+        if workers > 1:
+            pool.close()
+            pool.join()
+    write_book(path, records, plies, depth)
+    return len(records)
+
+def main(argv: list[str] = None) -> None:
+    '''Command line entry point of the offline builder'''
+    parser = argparse.ArgumentParser(description="Builds the Quixo opening book")
+    parser.add_argument("--plies", type=int, default=3, help="positions of fewer than this many moves are stored")
+    parser.add_argument("--depth", type=int, default=4, help="depth of the search of every position")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--output", default=DEFAULT_BOOK_PATH, help="book file")
+    args = parser.parse_args(argv)
+    from tqdm import tqdm
+    stored = build_book(args.output, args.plies, args.depth, args.workers, progress=lambda results, total: tqdm(results, total=total, unit="position"))
+    print(f"{stored} positions written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import json
+import time
+
+class SearchStats(object):
+    '''
+    Counters of the searches of an AIPlayer. Collected only while attached to the player (AIPlayer.stats), a detached player pays nothing.
+    Every finished move becomes a record in self.records; nodes searched by pool workers in parallel mode are not counted
+    '''
+    def __init__(self) -> None:
+        self.records = []
+        self.start_search(0)
+
+    def start_search(self, max_depth: int, table=None) -> None:
+        '''Resets the counters for a new move, the lists are indexed by ply from the root'''
+        self.nodes = [0] * (max_depth + 1)       # nodes entered, leaves included
+        self.expanded = [0] * (max_depth + 1)    # nodes whose moves were searched
+        self.children = [0] * (max_depth + 1)    # moves searched below expanded nodes
+        self.cutoffs = [0] * (max_depth + 1)     # expanded nodes that failed high
+        self.first_cutoffs = [0] * (max_depth + 1)  # ... on their first move
+        # the counters of the transposition table grow across searches, only the difference belongs to this move
+        self._tt_start = (table.hits, table.misses, table.collisions) if table is not None else (0, 0, 0)
+        self._start = time.perf_counter()
+
+    def end_search(self, ply: int, player: int, max_depth: int, move: int | None, table=None, book: bool = False) -> dict:
+        '''Closes the counters of the move and stores its record'''
+        elapsed = time.perf_counter() - self._start
+        nodes = sum(self.nodes)
+        expanded = sum(self.expanded)
+        record = {
+            "ply": ply,
+            "player": player,
+            "max_depth": max_depth,
+            "move": move,
+            "book": book,
+            "time": elapsed,
+            "nodes": nodes,
+            "nodes_per_second": nodes / elapsed if elapsed > 0 else 0.0,
+            "cutoff_rate": sum(self.cutoffs) / expanded if expanded else 0.0,
+            "first_move_cutoff_rate": sum(self.first_cutoffs) / max(sum(self.cutoffs), 1),
+            "branching": [children / count if count else 0.0 for children, count in zip(self.children, self.expanded)],
+            "nodes_by_ply": list(self.nodes),
+        }
+        if table is not None:
+            hits = table.hits - self._tt_start[0]
+            probes = hits + table.misses - self._tt_start[1] + table.collisions - self._tt_start[2]
+            record["tt_probes"] = probes
+            record["tt_hit_rate"] = hits / probes if probes else 0.0
+        self.records.append(record)
+        return record
+
+    def summary(self) -> dict:
+        '''Totals over every record'''
+        searched = [record for record in self.records if not record["book"]]
+        total_time = sum(record["time"] for record in searched)
+        total_nodes = sum(record["nodes"] for record in searched)
+        return {
+            "moves": len(self.records),
+            "book_moves": len(self.records) - len(searched),
+            "time": total_time,
+            "time_per_move": total_time / len(searched) if searched else 0.0,
+            "nodes": total_nodes,
+            "nodes_per_second": total_nodes / total_time if total_time > 0 else 0.0,
+        }
+
+    def write(self, path: str) -> None:
+        '''Writes the records as JSON lines'''
+        with open(path, "w") as file:
+            for record in self.records:
+                file.write(json.dumps(record) + "\n")
+
+class PlayStats(object):
+    '''
+    Timing of every ply of Game.play, collected only while attached to the game (Game.stats).
+    A record per ply: ply, player, time spent in make_move calls and rejected proposals
+    '''
+    def __init__(self) -> None:
+        self.records = []
+
+    def add(self, ply: int, player: int, elapsed: float, rejected: int) -> None:
+        self.records.append({"ply": ply, "player": player, "time": elapsed, "rejected": rejected})
+
+    def time_per_ply(self, player: int = None) -> float:
+        '''Average time of a ply, of one player only if given'''
+        times = [record["time"] for record in self.records if player is None or record["player"] == player]
+        return sum(times) / len(times) if times else 0.0
+
+    def write(self, path: str) -> None:
+        '''Writes the records as JSON lines'''
+        with open(path, "w") as file:
+            for record in self.records:
+                file.write(json.dumps(record) + "\n")
@@ -0,0 +1,363 @@
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from bitboard import BitboardGame
+from game import MOVE_CODES, MOVES, Move
+from randomplayer import RandomPlayer
+from tournament import PLAYER_SPECS, make_player
+
+# Game server: an asyncio loop hosts one Quixo session per connection, a client against an AI player of PLAYER_SPECS.
+# The loop only validates and applies moves, every AI move is searched in a bounded process pool, so a GODLIKE search
+# in one session never stalls the others. The protocol is line based, one command per line and one JSON object per reply:
+#   NEW <spec> [first|second] [time limit]   starts a game, the client moves first unless "second"
+#   MOVE <x> <y> <top|bottom|left|right>     plays a move of the client, the reply comes after the answer of the AI
+#   STATE                                    board, player to move, winner and legal moves of the client
+#   STATS                                    counters of the server
+#   QUIT                                     closes the connection
+# Errors are replied as {"error": message} and leave the session as it was
+
+SLIDES = {"top": Move.TOP, "bottom": Move.BOTTOM, "left": Move.LEFT, "right": Move.RIGHT}
+SLIDE_NAMES = {slide: name for name, slide in SLIDES.items()}
+
+# players of the worker process by spec, built on first use and reused by every session the worker serves
+_server_players = {}
+
+def _server_player(spec: str, time_limit: float | None):
+    '''Returns the player of this process for a spec, building it on first use, with the time limit per move of the session asking'''
+    if spec not in _server_players:
+        _server_players[spec] = make_player(spec)
+    player = _server_players[spec]
+    # AIPlayer deepens iteratively and MCTSPlayer stops its playouts within the limit, the random player needs none
+    if not isinstance(player, RandomPlayer):
+        player.time_limit = time_limit
+    return player
+
+def ai_move(spec: str, time_limit: float | None, first: int, second: int, player: int, history: list[int]) -> int:
+    '''Worker side: the code of the move of the AI player in the position given by its masks and move codes'''
+    game = BitboardGame.from_bitboards(first, second, player, history)
+    legal = game.legal_codes(player)
+    ai = _server_player(spec, time_limit)
+    # as Game.play, a player is asked again until it makes an acceptable move
+    while True:
+        from_pos, slide = ai.make_move(game)
+        code = MOVE_CODES.get((tuple(from_pos), slide))
+        if code in legal:
+            return code
+
+def format_move(code: int) -> str:
+    (x, y), slide = MOVES[code]
+    return f"{x} {y} {SLIDE_NAMES[slide]}"
+
+def percentile(values: list[float], q: float) -> float:
+    '''Nearest-rank percentile of sorted values, 0 if there are none'''
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+class Session(object):
+    '''A game between the client (player human) and an AI player'''
+    def __init__(self, spec: str, human: int, time_limit: float | None) -> None:
+        self.spec = spec
+        self.human = human
+        self.time_limit = time_limit
+        self.game = BitboardGame()
+        # player 0 moves first, as in Game.play
+        self.game.current_player_idx = 0
+        self.winner = -1
+
+    def play(self, code: int) -> None:
+        '''Plays a move of the player to move and passes the turn, the move must be legal'''
+        game = self.game
+        game.push_code(code)
+        self.winner = game.check_winner()
+        if self.winner == -1:
+            self.winner = 10 if game.is_draw() else -1
+        game.current_player_idx = 1 - game.current_player_idx
+
+    def state(self) -> dict:
+        game = self.game
+        player = game.get_current_player()
+        board = game.get_board()
+        return {
+            "board": ["".join(str(cell) if cell in (0, 1) else "." for cell in row) for row in board.tolist()],
+            "player": player,
+            "you": self.human,
+            "winner": int(self.winner),
+            "moves": game.moves_made(),
+            "legal": [format_move(code) for code in game.legal_codes(player)] if self.winner == -1 and player == self.human else [],
+        }
+
+class QuixoServer(object):
+    '''
+    Hosts the sessions. At most one AI move per worker is in the pool at once, so every job submitted starts at once. Further ones wait
+    for a worker (queue depth in STATS) while their sessions stop reading from their sockets, so TCP holds back the clients. Connections beyond max_sessions are refused.
+    An AI move gets the time limit of its session to search (at most max_time_limit), and once in the pool grace more seconds to come back: after that a random
+    legal move is played instead and the late result is thrown away. A client silent for idle_timeout seconds is disconnected
+    '''
+    def __init__(self, workers: int = os.cpu_count(), max_sessions: int = 1000, time_limit: float | None = None,
+                 grace: float = 5.0, idle_timeout: float | None = 300.0, latency_window: int = 10_000, max_time_limit: float = 60.0) -> None:
+        self.workers = workers
+        # spawned, not forked: a worker forked while connections are open would keep their sockets open after the sessions close them
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        # no job waits in the queue of the pool, where the clock of its time limit would already be running
+        self.slots = asyncio.Semaphore(workers)
+        self.max_sessions = max_sessions
+        self.max_time_limit = max_time_limit
+        self.time_limit = None if time_limit is None else min(time_limit, max_time_limit)
+        self.grace = grace
+        self.idle_timeout = idle_timeout
+        self.sessions = 0
+        self.sessions_total = 0
+        self.refused = 0
+        self.waiting = 0
+        self.running = 0
+        self.ai_moves = 0
+        self.timeouts = 0
+        # seconds from the request of every recent AI move to its answer, waiting for a slot included
+        self.latencies = deque(maxlen=latency_window)
+        self.server = None
+        self.loop = None
+        # connections being served, closed along with the server
+        self.writers = set()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765, path: str = None) -> None:
+        '''Listens on a TCP port, or on a local socket if path is given'''
+        self.loop = asyncio.get_running_loop()
+        if path:
+            self.server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+
+    def address(self):
+        return self.server.sockets[0].getsockname()
+
+    async def close(self) -> None:
+        self.server.close()
+        for writer in list(self.writers):
+            writer.close()
+        await self.server.wait_closed()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "sessions": self.sessions,
+            "sessions_total": self.sessions_total,
+            "refused": self.refused,
+            "queued": self.waiting,
+            "running": self.running,
+            "ai_moves": self.ai_moves,
+            "timeouts": self.timeouts,
+            "latency_ms": {f"p{q}": round(percentile(latencies, q) * 1000, 2) for q in (50, 90, 99)} | {"max": round(latencies[-1] * 1000, 2) if latencies else 0.0},
+        }
+
+    def _release(self) -> None:
+        self.running -= 1
+        self.slots.release()
+
+    async def ai_move(self, session: Session) -> int:
+        '''Code of the move of the AI player of a session, searched in the pool'''
+        start = time.perf_counter()
+        game = session.game
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        future = self.pool.submit(ai_move, session.spec, session.time_limit, *game.get_bitboards(), game.get_current_player(), game.move_codes())
+        # the slot is given back when the worker is really free, even if the session stopped waiting for it.
+        # Done callbacks run in a thread of the pool, the semaphore belongs to the loop
+        future.add_done_callback(lambda _: self.loop.call_soon_threadsafe(self._release))
+        limit = None if session.time_limit is None else session.time_limit + self.grace
+        try:
+            code = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), limit)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            code = random.choice(game.legal_codes(game.get_current_player()))
+        self.ai_moves += 1
+        self.latencies.append(time.perf_counter() - start)
+        return code
+
+    async def command(self, session: Session | None, line: str) -> tuple[Session | None, dict]:
+        '''Runs a command, returns the session after it and the reply'''
+        words = line.split()
+        if not words:
+            return session, {"error": "empty command"}
+        match words[0].upper():
+            case "NEW":
+                if len(words) < 2 or words[1] not in PLAYER_SPECS:
+                    return session, {"error": f"usage: NEW <{'|'.join(PLAYER_SPECS)}> [first|second] [time limit]"}
+                side = words[2].lower() if len(words) > 2 else "first"
+                if side not in ("first", "second"):
+                    return session, {"error": "the side is first or second"}
+                try:
+                    time_limit = float(words[3]) if len(words) > 3 else self.time_limit
+                except ValueError:
+                    time_limit = math.nan
+                if time_limit is not None:
+                    if not math.isfinite(time_limit) or time_limit <= 0:
+                        return session, {"error": "the time limit is a positive number of seconds"}
+                    time_limit = min(time_limit, self.max_time_limit)
+                session = Session(words[1], 0 if side == "first" else 1, time_limit)
+                if session.human == 1:
+                    session.play(await self.ai_move(session))
+                return session, session.state()
+            case "MOVE":
+                if session is None:
+                    return session, {"error": "no game, start one with NEW"}
+                if session.winner != -1:
+                    return session, {"error": "the game is over"}
+                try:
+                    x, y, slide = words[1:]
+                    move = ((int(x), int(y)), SLIDES[slide.lower()])
+                except (ValueError, KeyError):
+                    return session, {"error": "usage: MOVE <x> <y> <top|bottom|left|right>"}
+                code = MOVE_CODES.get(move)
+                if code not in session.game.legal_codes(session.human):
+                    return session, {"error": "illegal move"}
+                session.play(code)
+                reply = {}
+                if session.winner == -1:
+                    code = await self.ai_move(session)
+                    session.play(code)
+                    reply["ai"] = format_move(code)
+                return session, {**session.state(), **reply}
+            case "STATE":
+                return session, session.state() if session else {"error": "no game, start one with NEW"}
+            case "STATS":
+                return session, self.stats()
+        return session, {"error": f"unknown command {words[0]}"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''Serves one connection until QUIT, end of file or idle timeout'''
+        if self.sessions >= self.max_sessions:
+            self.refused += 1
+            writer.write(b'{"error": "server full"}\n')
+            writer.close()
+            return
+        self.sessions += 1
+        self.sessions_total += 1
+        self.writers.add(writer)
+        session = None
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    writer.write(b'{"error": "idle timeout"}\n')
+                    break
+                if not line or line.strip().upper() == b"QUIT":
+                    break
+                session, reply = await self.command(session, line.decode(errors="replace"))
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            # a client gone or sending a line longer than the reader limit ends its session only
+            pass
+        finally:
+            self.sessions -= 1
+            self.writers.discard(writer)
+            writer.close()
+
+async def client(host: str, port: int, spec: str, games: int = 1, side: str = "first", time_limit: float = None, seed=None, path: str = None) -> list[int]:
+    '''
+    Stand-in for a real client: plays games against spec with random legal moves through the protocol.
+    Returns the winner of every game as Game.play, 0 and 1 being the player that moved first and second
+    '''
+    rng = random.Random(seed)
+    reader, writer = await (asyncio.open_unix_connection(path) if path else asyncio.open_connection(host, port))
+
+    async def send(line):
+        writer.write(line.encode() + b"\n")
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply
+
+    winners = []
+    try:
+        for _ in range(games):
+            state = await send(f"NEW {spec} {side}" + (f" {time_limit}" if time_limit is not None else ""))
+            while state["winner"] == -1:
+                state = await send("MOVE " + rng.choice(state["legal"]))
+            winners.append(state["winner"])
+        writer.write(b"QUIT\n")
+        await writer.drain()
+        # the server closes the connection once the session is over
+        await reader.read()
+    finally:
+        writer.close()
+    return winners
+
+async def serve(args) -> None:
+    server = QuixoServer(args.workers, args.max_sessions, args.time_limit, args.grace, args.idle_timeout,
+                         max_time_limit=args.max_time_limit)
+    await server.start(args.host, args.port, args.unix)
+    print(f"Serving Quixo on {args.unix or '%s:%d' % server.address()[:2]}")
+    try:
+        while True:
+            await asyncio.sleep(args.report or 3600)
+            if args.report:
+                print(json.dumps(server.stats()), flush=True)
+    finally:
+        await server.close()
+
+async def bench(args) -> dict:
+    '''A server on a free local port and args.clients clients playing at once, returns the statistics of the server'''
+    server = QuixoServer(args.workers, args.max_sessions, args.time_limit, args.grace, args.idle_timeout,
+                         max_time_limit=args.max_time_limit)
+    await server.start(args.host, 0)
+    host, port = server.address()[:2]
+    start = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(client(host, port, args.spec, args.games, "first" if i % 2 == 0 else "second", args.time_limit, args.seed + i)
+                                         for i in range(args.clients)))
+    finally:
+        stats = server.stats()
+        await server.close()
+    stats["games"] = sum(len(winners) for winners in results)
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    return stats
+
+def main(argv: list[str] = None) -> None:
+    '''Command line entry point: "serve" hosts sessions until interrupted, "bench" plays simulated clients against a local server'''
+    parser = argparse.ArgumentParser(description="Quixo game server")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, description in (("serve", "hosts sessions until interrupted"), ("bench", "simulated clients against a local server")):
+        command = commands.add_parser(name, help=description)
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--workers", type=int, default=os.cpu_count(), help="processes searching the AI moves")
+        command.add_argument("--max-sessions", type=int, default=1000, help="connections served at once, others are refused")
+        command.add_argument("--time-limit", type=float, help="default seconds per AI move, NEW can set its own")
+        command.add_argument("--max-time-limit", type=float, default=60.0, help="longest time limit per AI move a session can ask for")
+        command.add_argument("--grace", type=float, default=5.0, help="seconds past the time limit before a random move is played instead")
+        command.add_argument("--idle-timeout", type=float, default=300.0, help="seconds a client can stay silent")
+    serve_parser = commands.choices["serve"]
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--unix", help="local socket path instead of a TCP port")
+    serve_parser.add_argument("--report", type=float, help="prints the statistics every this many seconds")
+    bench_parser = commands.choices["bench"]
+    bench_parser.add_argument("--clients", type=int, default=20, help="clients playing at once")
+    bench_parser.add_argument("--games", type=int, default=1, help="games of every client")
+    bench_parser.add_argument("--spec", choices=PLAYER_SPECS, default="dumb", help="AI player of the sessions")
+    bench_parser.add_argument("--seed", type=int, default=0, help="seed of the first client, client i uses seed + i")
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            pass
+        return
+    print(json.dumps(asyncio.run(bench(args)), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+from game import Move, MOVES, MOVE_CODES
+
+# The 8 symmetries of the square board, as maps of the (X, Y) coordinates
+TRANSFORMS = (
+    lambda x, y: (x, y),          # identity
+    lambda x, y: (4 - y, x),      # rotation by 90 degrees
+    lambda x, y: (4 - x, 4 - y),  # rotation by 180 degrees
+    lambda x, y: (y, 4 - x),      # rotation by 270 degrees
+    lambda x, y: (4 - x, y),      # mirror left-right
+    lambda x, y: (x, 4 - y),      # mirror top-bottom
+    lambda x, y: (y, x),          # mirror on the principal diagonal
+    lambda x, y: (4 - y, 4 - x),  # mirror on the secondary diagonal
+)
+
+# Direction in which each slide pushes the taken piece
+_DIRECTIONS = {Move.TOP: (0, -1), Move.BOTTOM: (0, 1), Move.LEFT: (-1, 0), Move.RIGHT: (1, 0)}
+
+def _transform_move(transform, move: tuple[tuple[int, int], Move]) -> tuple[tuple[int, int], Move]:
+    '''Maps a move through a symmetry: the cell is moved and the slide direction is rotated/mirrored with it'''
+    (x, y), slide = move
+    dx, dy = _DIRECTIONS[slide]
+    # the image of the direction is the difference between the images of two points along it
+    cx, cy = transform(2, 2)
+    nx, ny = transform(2 + dx, 2 + dy)
+    new_slide = next(s for s, d in _DIRECTIONS.items() if d == (nx - cx, ny - cy))
+    return transform(x, y), new_slide
+
+# CELL_SYMMETRIES[s][cell] is the image of cell (bit y*5 + x) through symmetry s
+CELL_SYMMETRIES: tuple[tuple[int, ...], ...] = tuple(
+    tuple(transform(c % 5, c // 5)[1] * 5 + transform(c % 5, c // 5)[0] for c in range(25))
+    for transform in TRANSFORMS
+)
+# MOVE_SYMMETRIES[s][code] is the code of the image of move code through symmetry s
+MOVE_SYMMETRIES: tuple[tuple[int, ...], ...] = tuple(
+    tuple(MOVE_CODES[_transform_move(transform, move)] for move in MOVES)
+    for transform in TRANSFORMS
+)
+# INVERSE_SYMMETRIES[s] is the symmetry that undoes s
+INVERSE_SYMMETRIES: tuple[int, ...] = tuple(
+    next(t for t in range(8) if all(CELL_SYMMETRIES[t][CELL_SYMMETRIES[s][c]] == c for c in range(25)))
+    for s in range(8)
+)
+
+def transform_mask(mask: int, symmetry: int) -> int:
+    '''Maps a 25-bit board mask through a symmetry'''
+    cells = CELL_SYMMETRIES[symmetry]
+    result = 0
+    while mask:
+        low = mask & -mask
+        result |= 1 << cells[low.bit_length() - 1]
+        mask ^= low
+    return result
@@ -0,0 +1,65 @@
+import random
+import numpy as np
+from batch import TAKE, BatchGame
+from bitboard import BitboardGame
+from game import MOVES, Game
+
+# The engines must agree move by move with Game, the reference: same possible moves, board, winner and draws. Run with pytest
+
+def random_games(n_games: int, seed: int):
+    '''Yields n_games pairs of a Game and a BitboardGame, then the same pair after every random move until the game ends'''
+    rng = random.Random(seed)
+    for _ in range(n_games):
+        game, bitboard = Game(), BitboardGame()
+        player = 0
+        yield game, bitboard
+        while game.check_winner() == -1 and not game.is_draw():
+            code = rng.choice(game.get_possible_moves(player, encoded=True))
+            assert game.push_code(code, player) and bitboard.push_code(code, player)
+            player = 1 - player
+            yield game, bitboard
+
+def test_bitboard_matches_game() -> None:
+    for game, bitboard in random_games(200, seed=3):
+        assert np.array_equal(game.get_board(), bitboard.get_board())
+        for player in (0, 1):
+            assert sorted(game.get_possible_moves(player, encoded=True)) == sorted(bitboard.get_possible_moves(player, encoded=True))
+        assert game.check_winner() == bitboard.check_winner()
+        assert game.is_draw() == bitboard.is_draw()
+
+def test_bitboard_pop_restores_the_position() -> None:
+    for _, bitboard in random_games(20, seed=4):
+        position, codes = bitboard.get_bitboards(), bitboard.move_codes()
+        for player in (0, 1):
+            for code in bitboard.legal_codes(player):
+                bitboard.push_code(code, player)
+                bitboard.pop()
+                assert bitboard.get_bitboards() == position and bitboard.move_codes() == codes
+
+def test_batch_matches_game() -> None:
+    rng = np.random.default_rng(5)
+    batch = BatchGame(300)
+    games = [Game() for _ in range(len(batch))]
+    while batch.running().any():
+        index = np.flatnonzero(batch.running())
+        legal = batch.legal_mask()
+        codes = batch.random_moves(rng)
+        for i in index:
+            player = int(batch.current_player[i])
+            assert np.flatnonzero(legal[i]).tolist() == sorted(games[i].get_possible_moves(player, encoded=True))
+            assert games[i].push_code(int(codes[i]), player)
+        # the running games all move, the finished ones are left as they are
+        assert np.array_equal(np.flatnonzero(batch.move(codes)), index)
+        for i in index:
+            game = games[i]
+            assert np.array_equal(batch.to_game(i).get_board(), game.get_board())
+            winner = game.check_winner()
+            assert batch.winner[i] == (winner if winner != -1 else 10 if game.is_draw() else -1)
+
+def test_batch_rejects_taking_an_opponent_piece() -> None:
+    batch = BatchGame(1)
+    batch.move(np.array([0]))
+    # player 1 cannot take the cube player 0 just moved
+    taken = next(code for code in range(len(MOVES)) if int(batch.first[0]) & int(TAKE[code]))
+    assert not batch.move(np.array([taken]))[0]
+    assert batch.n_moves[0] == 1 and batch.current_player[0] == 1
@@ -0,0 +1,79 @@
+import random
+from bitboard import BitboardGame
+from game import RepetitionDetector
+from threats import analyze, forced_win, winning_moves
+
+# threats.py only looks at the lines that can be completed: its answers are checked against trying every move. Run with pytest
+
+def random_positions(n_positions: int, seed: int):
+    '''Yields n_positions random running games with the player to move'''
+    rng = random.Random(seed)
+    for _ in range(n_positions):
+        game, player = BitboardGame(), 0
+        for _ in range(rng.randint(4, 40)):
+            game.push_code(rng.choice(game.legal_codes(player)), player)
+            if game.check_winner() != -1 or game.is_draw():
+                game.pop()
+                break
+            player = 1 - player
+        yield game, player
+
+def outcomes(game: BitboardGame, player: int) -> dict[int, int]:
+    '''Winner after every legal move of player, by move code'''
+    result = {}
+    for code in game.legal_codes(player):
+        game.push_code(code, player)
+        result[code] = game.check_winner()
+        game.pop()
+    return result
+
+def wins_within(game: BitboardGame, player: int, depth: int) -> bool:
+    '''True if player, to move, wins within depth moves of its own whatever the opponent answers, trying every move'''
+    for code in game.legal_codes(player):
+        game.push_code(code, player)
+        winner = game.check_winner()
+        won = winner == player or (winner == -1 and not game.is_draw() and depth > 1 and loses_within(game, 1 - player, depth - 1))
+        game.pop()
+        if won:
+            return True
+    return False
+
+def loses_within(game: BitboardGame, defender: int, depth: int) -> bool:
+    '''True if every move of defender loses within depth moves of the attacker'''
+    for code in game.legal_codes(defender):
+        game.push_code(code, defender)
+        winner = game.check_winner()
+        lost = winner == 1 - defender or (winner == -1 and not game.is_draw() and wins_within(game, 1 - defender, depth))
+        game.pop()
+        if not lost:
+            return False
+    return True
+
+def test_analyze_matches_brute_force() -> None:
+    for game, player in random_positions(1500, seed=1):
+        first, second = game.get_bitboards()
+        threats = analyze(first, second, player)
+        mine, theirs = outcomes(game, player), outcomes(game, 1 - player)
+        assert threats.wins == [code for code, winner in mine.items() if winner == player]
+        assert threats.losses == [code for code, winner in mine.items() if winner == 1 - player]
+        assert threats.threats == [code for code, winner in theirs.items() if winner == 1 - player]
+        assert winning_moves(first, second, player) == threats.wins
+
+def test_forced_wins_are_sound() -> None:
+    found = 0
+    for game, player in random_positions(1000, seed=2):
+        first, second = game.get_bitboards()
+        for depth in (1, 2):
+            repetition = RepetitionDetector()
+            for code in game.move_codes():
+                repetition.push(code)
+            moves = repetition.moves()
+            code = forced_win(first, second, player, depth, repetition)
+            assert repetition.moves() == moves
+            if code is None:
+                continue
+            found += 1
+            game.push_code(code, player)
+            assert game.check_winner() == player or (depth > 1 and loses_within(game, 1 - player, depth - 1))
+            game.pop()
+    assert found
@@ -0,0 +1,148 @@
+from collections import namedtuple
+from bitboard import FULL_MASK, LINES, SLIDES
+from game import RepetitionDetector
+
+# Threat analysis on the masks of BitboardGame. A move slides one row or column: the pieces of that line only move along it, and any other
+# line has at most one of its cells rewritten. So a move adds at most one piece of a player to a line, and a player can only complete
+# a line that already holds 4 of its pieces. Only these hot lines are ever checked: most positions have none, and then no threat at all
+
+# Cells rewritten by every move, see MOVES. A move cannot complete a line it does not touch
+SEGMENTS: tuple[int, ...] = tuple(FULL_MASK & ~keep for _, keep, _, _, _ in SLIDES)
+
+# wins: moves of the player to move that win at once. losses: its moves that make the other player win at once (a slide can complete
+# a line of the opponent). threats: moves that would make the opponent win if it were its turn, the ones the player has to block
+Threats = namedtuple("Threats", ["wins", "losses", "threats"])
+
+def hot_lines(first: int, second: int) -> tuple[tuple[int, ...], int, int]:
+    '''Lines holding 4 pieces of a player, in the order of LINES, with the cells of those of player 0 and of those of player 1'''
+    lines, hot_first, hot_second = [], 0, 0
+    for line in LINES:
+        if (first & line).bit_count() == 4:
+            lines.append(line)
+            hot_first |= line
+        elif (second & line).bit_count() == 4:
+            lines.append(line)
+            hot_second |= line
+    return tuple(lines), hot_first, hot_second
+
+def after(first: int, second: int, player: int, code: int) -> tuple[int, int]:
+    '''Masks of player 0 and player 1 after player makes a legal move, as BitboardGame._apply'''
+    _, keep, source, shift, dest = SLIDES[code]
+    mine, other = (first, second) if player == 0 else (second, first)
+    if shift > 0:
+        mine = (mine & keep) | ((mine & source) << shift) | dest
+        other = (other & keep) | ((other & source) << shift)
+    else:
+        mine = (mine & keep) | ((mine & source) >> -shift) | dest
+        other = (other & keep) | ((other & source) >> -shift)
+    return (mine, other) if player == 0 else (other, mine)
+
+def winner(first: int, second: int, lines: tuple[int, ...]) -> int:
+    '''Same as BitboardGame.check_winner, looking at the given lines only'''
+    for line in lines:
+        if first & line == line:
+            return 0
+        if second & line == line:
+            return 1
+    return -1
+
+def winning_moves(first: int, second: int, player: int, hot: tuple = None, first_only: bool = False) -> list[int]:
+    '''Codes of the moves that make player win at once. hot is the result of hot_lines if the caller has it'''
+    lines, hot_first, hot_second = hot_lines(first, second) if hot is None else hot
+    target = hot_first if player == 0 else hot_second
+    if not target:
+        return []
+    # cubes of the opponent cannot be taken
+    blocked = second if player == 0 else first
+    wins = []
+    for code, segment in enumerate(SEGMENTS):
+        if segment & target and not blocked & SLIDES[code][0] and winner(*after(first, second, player, code), lines) == player:
+            wins.append(code)
+            if first_only:
+                break
+    return wins
+
+def analyze(first: int, second: int, player: int) -> Threats:
+    '''Immediate wins and losses of the player to move, and the threats of the opponent, in one pass over the moves'''
+    hot = hot_lines(first, second)
+    lines, hot_first, hot_second = hot
+    wins, losses, threats = [], [], []
+    if not lines:
+        return Threats(wins, losses, threats)
+    opponent = 1 - player
+    masks = (first, second)
+    for code, segment in enumerate(SEGMENTS):
+        if not segment & (hot_first | hot_second):
+            continue
+        taken = SLIDES[code][0]
+        if not masks[opponent] & taken:
+            result = winner(*after(first, second, player, code), lines)
+            if result == player:
+                wins.append(code)
+            elif result == opponent:
+                losses.append(code)
+        if not masks[player] & taken and winner(*after(first, second, opponent, code), lines) == opponent:
+            threats.append(code)
+    return Threats(wins, losses, threats)
+
+def _legal(first: int, second: int, player: int) -> list[int]:
+    blocked = second if player == 0 else first
+    return [code for code in range(len(SLIDES)) if not blocked & SLIDES[code][0]]
+
+def forced_win(first: int, second: int, player: int, depth: int, repetition: RepetitionDetector = None) -> int | None:
+    '''
+    First move of a win of player within depth moves of its own (2 * depth - 1 plies) whatever the opponent answers, None if none is found.
+    Threat-space search: before its last move player only tries threats, moves after which it could win at once, so that the opponent
+    has few answers worth trying and the tree stays narrow. Every answer is still tried, so a win found is a real one, but wins starting
+    with a quiet move are missed. repetition holds the moves made so far (it is left as it was): sequences drawn by repetition
+    or by length do not count
+    '''
+    repetition = RepetitionDetector() if repetition is None else repetition
+    return _attack(first, second, player, depth, repetition)
+
+def _attack(first: int, second: int, player: int, depth: int, repetition: RepetitionDetector) -> int | None:
+    hot = hot_lines(first, second)
+    wins = winning_moves(first, second, player, hot, first_only=True)
+    if wins:
+        return wins[0]
+    if depth <= 1:
+        return None
+    candidates = []
+    for code in _legal(first, second, player):
+        new_first, new_second = after(first, second, player, code)
+        # only a hot line can be full after a move, and player has no win here: the move would make the opponent win
+        if winner(new_first, new_second, hot[0]) != -1:
+            continue
+        threats = len(winning_moves(new_first, new_second, player))
+        if threats:
+            candidates.append((-threats, code, new_first, new_second))
+    # double threats first, they are the likeliest to win
+    candidates.sort()
+    for _, code, new_first, new_second in candidates:
+        if repetition.push(code):
+            repetition.pop()
+            continue
+        proven = _defend(new_first, new_second, 1 - player, depth - 1, repetition)
+        repetition.pop()
+        if proven:
+            return code
+    return None
+
+def _defend(first: int, second: int, defender: int, depth: int, repetition: RepetitionDetector) -> bool:
+    '''True if every move of defender loses within depth moves of the attacker'''
+    attacker = 1 - defender
+    lines = hot_lines(first, second)[0]
+    for code in _legal(first, second, defender):
+        new_first, new_second = after(first, second, defender, code)
+        result = winner(new_first, new_second, lines)
+        if result == attacker:
+            continue
+        if result == defender or repetition.push(code):
+            if result == -1:
+                repetition.pop()
+            return False
+        proven = _attack(new_first, new_second, attacker, depth, repetition) is not None
+        repetition.pop()
+        if not proven:
+            return False
+    return True
@@ -0,0 +1,183 @@
+import argparse
+import csv
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from aiplayer import AIPlayer
+from game import Game, Move, Player
+from mctsplayer import MCTSPlayer
+from randomplayer import RandomPlayer
+
+# Players a tournament can field, by the name used on the command line. Workers build them from the name, so nothing has to be pickled
+PLAYER_SPECS = {
+    "random": (RandomPlayer, {}),
+    "dumb": (AIPlayer, {"max_depth": 1}),
+    "weak": (AIPlayer, {"max_depth": 2}),
+    "strong": (AIPlayer, {"max_depth": 3}),
+    "godlike": (AIPlayer, {"max_depth": 4}),
+    "mcts": (MCTSPlayer, {"playouts": 1000}),
+}
+# Same players by the name they show in the menu
+SPEC_BY_NAME = {"Random": "random", "Dumb AI": "dumb", "Weak AI": "weak", "Strong AI": "strong", "GODLIKE AI": "godlike", "MCTS AI": "mcts"}
+
+RECORD_FIELDS = ["game", "seed", "player_1", "player_2", "swapped", "winner", "result", "length", "time_per_move_1", "time_per_move_2"]
+
+def make_player(spec: str) -> Player:
+    '''Builds a player from its command line name'''
+    player_class, kwargs = PLAYER_SPECS[spec]
+    return player_class(**kwargs)
+
+class TimedPlayer(Player):
+    '''
+    Forwards make_move to another player and keeps the time spent on every move it played. Game.play asks again when
+    a move is rejected, so the time of rejected proposals is added to the move that is finally accepted
+    '''
+    def __init__(self, player: Player) -> None:
+        super().__init__()
+        self.player = player
+        self.name = player.name
+        self.times = []
+        self._pending = 0.0
+
+    def make_move(self, game: 'Game') -> tuple[tuple[int, int], Move]:
+        start = time.perf_counter()
+        from_pos, slide = move = self.player.make_move(game)
+        self._pending += time.perf_counter() - start
+        # the moves Game.push accepts are the possible ones of the player to move
+        if (tuple(from_pos), slide) in game.get_possible_moves(game.get_current_player()):
+            self.times.append(self._pending)
+            self._pending = 0.0
+        return move
+
+# players of the worker process, built once per spec and seat and reused for every game it plays. A player playing itself
+# gets one instance per seat, so that the two sides do not share search trees, tables or statistics
+_worker_players = {}
+
+def worker_player(spec: str, seat: int) -> Player:
+    '''Returns the player of this process for a spec playing as player seat (0 or 1), building it on first use'''
+    if (spec, seat) not in _worker_players:
+        _worker_players[(spec, seat)] = make_player(spec)
+    return _worker_players[(spec, seat)]
+
+def play_game(game_index: int, spec_a: str, spec_b: str, seed: int, swapped: bool) -> dict:
+    '''
+    Plays one game between A and B (A moves first unless swapped) and returns its record.
+    result is "A", "B" or "draw", winner is the raw value returned by Game.play
+    '''
+    random.seed(seed)
+    players = []
+    for seat, spec in enumerate((spec_b, spec_a) if swapped else (spec_a, spec_b)):
+        players.append(TimedPlayer(worker_player(spec, seat)))
+    game = Game()
+    winner = game.play(players[0], players[1], False) # with interactive=False
+    if winner == 10:
+        result = "draw"
+    else:
+        result = "A" if (winner == 0) != swapped else "B"
+    return {
+        "game": game_index,
+        "seed": seed,
+        "player_1": spec_b if swapped else spec_a,
+        "player_2": spec_a if swapped else spec_b,
+        "swapped": swapped,
+        "winner": int(winner),
+        "result": result,
+        "length": len(game.move_history),
+        "time_per_move_1": sum(players[0].times) / max(len(players[0].times), 1),
+        "time_per_move_2": sum(players[1].times) / max(len(players[1].times), 1),
+    }
+
+def _play_game_task(task: tuple) -> dict:
+    '''Unpacks a task of the pool'''
+    return play_game(*task)
+
+def iter_tournament(spec_a: str, spec_b: str, n_games: int, workers: int = 1, seed: int = 0, swap_colours: bool = True):
+    '''
+    Plays n_games between A and B across a pool of workers and yields the record of every game as soon as it ends.
+    Game i is seeded with seed + i, and with swap_colours B moves first in every odd game, so any game can be replayed alone
+    '''
+    tasks = [(i, spec_a, spec_b, seed + i, swap_colours and i % 2 == 1) for i in range(n_games)]
+    if workers <= 1:
+        for task in tasks:
+            yield _play_game_task(task)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        # small chunks keep the stream flowing, big enough to amortize the inter-process traffic of fast games
+        chunksize = max(1, min(16, n_games // (workers * 8)))
+        yield from pool.imap_unordered(_play_game_task, tasks, chunksize=chunksize)
+
+class RecordWriter(object):
+    '''Streams game records to a JSONL or CSV file, chosen by the extension'''
+    def __init__(self, path: str) -> None:
+        self.file = open(path, "w", newline="")
+        self.csv = csv.DictWriter(self.file, fieldnames=RECORD_FIELDS) if path.endswith(".csv") else None
+        if self.csv:
+            self.csv.writeheader()
+
+    def write(self, record: dict) -> None:
+        if self.csv:
+            self.csv.writerow(record)
+        else:
+            self.file.write(json.dumps(record) + "\n")
+        # flushed at every game so an interrupted tournament keeps what it played
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+def wilson_interval(successes: int, total: int, z: float = 1.96) -> tuple[float, float]:
+    '''Wilson score confidence interval of a rate, 95% by default'''
+    if total == 0:
+        return 0.0, 0.0
+    rate = successes / total
+    denominator = 1 + z**2 / total
+    centre = (rate + z**2 / (2 * total)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / total + z**2 / (4 * total**2)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+def summarize(records: list[dict]) -> dict:
+    '''Aggregates game records into win/draw rates of A and B with their confidence intervals'''
+    total = len(records)
+    summary = {"games": total}
+    for outcome in ("A", "B", "draw"):
+        count = sum(1 for record in records if record["result"] == outcome)
+        summary[outcome] = {"count": count, "rate": count / total if total else 0.0, "ci95": wilson_interval(count, total)}
+    summary["mean_length"] = sum(record["length"] for record in records) / total if total else 0.0
+    return summary
+
+def run_tournament(spec_a: str, spec_b: str, n_games: int, workers: int = 1, seed: int = 0, swap_colours: bool = True, output: str = None) -> dict:
+    '''Plays a whole tournament, streaming the records to output if given, and returns its summary'''
+    writer = RecordWriter(output) if output else None
+    records = []
+    try:
+        for record in iter_tournament(spec_a, spec_b, n_games, workers, seed, swap_colours):
+            records.append(record)
+            if writer:
+                writer.write(record)
+    finally:
+        if writer:
+            writer.close()
+    return summarize(records)
+
+def main(argv: list[str] = None) -> None:
+    '''Command line entry point, it never loads the interactive UI'''
+    parser = argparse.ArgumentParser(description="Headless Quixo tournament between two players")
+    parser.add_argument("--p1", choices=PLAYER_SPECS, required=True, help="player A")
+    parser.add_argument("--p2", choices=PLAYER_SPECS, required=True, help="player B")
+    parser.add_argument("--games", type=int, default=100, help="number of games")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game, game i uses seed + i")
+    parser.add_argument("--no-swap", action="store_true", help="A always moves first")
+    parser.add_argument("--output", help="file (.jsonl or .csv) receiving one record per game")
+    args = parser.parse_args(argv)
+    summary = run_tournament(args.p1, args.p2, args.games, args.workers, args.seed, not args.no_swap, args.output)
+    print(f"{args.p1} (A) vs {args.p2} (B), {summary['games']} games, {summary['mean_length']:.1f} moves on average")
+    for outcome, label in (("A", f"{args.p1} wins"), ("B", f"{args.p2} wins"), ("draw", "draws")):
+        low, high = summary[outcome]["ci95"]
+        print(f"{label}: {summary[outcome]['count']} ({summary[outcome]['rate']*100:.1f}%, 95% CI {low*100:.1f}-{high*100:.1f}%)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+from enum import Enum
+
+# Kind of value stored in an entry
+EXACT = 0  # the minimax value of the position
+LOWER = 1  # the search failed high: the value is at least this
+UPPER = 2  # the search failed low: the value is at most this
+
+class Replacement(Enum):
+    '''
+    Policy used when a position has to be stored in a slot already holding another one
+    '''
+    ALWAYS = 0           # the newest entry always wins
+    DEPTH_PREFERRED = 1  # keep the deeper entry, unless it was left by an older search
+
+class TranspositionTable(object):
+    '''
+    Fixed-size table of search results keyed by position hash.
+    Each slot holds a single entry (key, depth, bound, value, move, generation); the slot of a key is key modulo the number of slots
+    '''
+    # Rough CPython footprint of one filled slot: the tuple, its boxed ints/float and the list pointer
+    ENTRY_BYTES = 160
+
+    def __init__(self, memory_mb: float = 64, replacement: Replacement = Replacement.DEPTH_PREFERRED) -> None:
+        # largest power of two of entries that fits in the memory cap
+        n_slots = 1
+        while n_slots * 2 * self.ENTRY_BYTES <= memory_mb * 2**20:
+            n_slots *= 2
+        self._slots = [None] * n_slots
+        self._index_mask = n_slots - 1
+        self.replacement = replacement
+        self.generation = 0
+        self.reset_counters()
+
+    def reset_counters(self) -> None:
+        '''Resets the hit/miss/collision counters'''
+        self.hits = 0        # probes that found the position
+        self.misses = 0      # probes that found an empty slot
+        self.collisions = 0  # probes that found another position in the slot
+        self.stores = 0
+        self.overwrites = 0  # stores that evicted another position
+
+    def new_search(self) -> None:
+        '''Marks the entries stored so far as old, so that DEPTH_PREFERRED lets newer searches replace them'''
+        self.generation += 1
+
+    def clear(self) -> None:
+        '''Empties the table'''
+        self._slots = [None] * len(self._slots)
+
+    def probe(self, key: int) -> tuple | None:
+        '''Returns the entry stored for the key, if any'''
+        entry = self._slots[key & self._index_mask]
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] != key:
+            self.collisions += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def store(self, key: int, depth: int, bound: int, value: float, move: int | None) -> None:
+        '''Stores a search result, unless the replacement policy prefers the entry already in the slot'''
+        index = key & self._index_mask
+        entry = self._slots[index]
+        if entry is not None and entry[0] != key:
+            if (self.replacement == Replacement.DEPTH_PREFERRED
+                    and entry[5] == self.generation and entry[1] > depth):
+                return
+            self.overwrites += 1
+        self._slots[index] = (key, depth, bound, value, move, self.generation)
+        self.stores += 1
+
+    def stats(self) -> dict:
+        '''Returns the counters of the table'''
+        probes = self.hits + self.misses + self.collisions
+        return {
+            "slots": len(self._slots),
+            "filled": sum(1 for entry in self._slots if entry is not None),
+            "hits": self.hits,
+            "misses": self.misses,
+            "collisions": self.collisions,
+            "hit_rate": self.hits / probes if probes else 0.0,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+        }
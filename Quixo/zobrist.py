@@ -0,0 +1,56 @@
+import random
+from symmetry import CELL_SYMMETRIES
+
+# Each position hash packs the 8 Zobrist hashes of the position seen through every board symmetry,
+# one 64-bit lane per symmetry, so that a single XOR updates all of them at once
+LANE_BITS = 64
+LANE_MASK = (1 << LANE_BITS) - 1
+_LANE_SHIFTS = tuple(range(0, 8 * LANE_BITS, LANE_BITS))
+
+# fixed seed: keys must be the same in every process (pool workers, opening book)
+_rng = random.Random(0x5155_1C0)
+_PIECE_KEYS = [[_rng.getrandbits(LANE_BITS) for _ in range(25)] for _ in range(2)]
+# Keys of the side to move and of the side the search is maximizing for. They are symmetry invariant
+SIDE_KEYS = (_rng.getrandbits(LANE_BITS), _rng.getrandbits(LANE_BITS))
+MAXIMIZING_KEY = _rng.getrandbits(LANE_BITS)
+# Keys of the number of moves left before the game is drawn by length, for positions close enough to it
+HORIZON_KEYS = tuple(_rng.getrandbits(LANE_BITS) for _ in range(64))
+
+def _packed_piece_key(player_id: int, cell: int) -> int:
+    '''Packs the key of a piece for every symmetry: lane s holds the key of the cell the piece is mapped to'''
+    return sum(_PIECE_KEYS[player_id][CELL_SYMMETRIES[s][cell]] << shift for s, shift in enumerate(_LANE_SHIFTS))
+
+def _row_keys(row: int) -> list[int]:
+    '''
+    Keys of every content of a row, indexed by (player 0 bits of the row) | (player 1 bits of the row) << 5.
+    Impossible contents (a cell owned by both) are filled too, they are simply never looked up
+    '''
+    bit_keys = [_packed_piece_key(0, row * 5 + i) for i in range(5)] + [_packed_piece_key(1, row * 5 + i) for i in range(5)]
+    keys = [0] * 1024
+    for content in range(1, 1024):
+        low = content & -content
+        keys[content] = keys[content ^ low] ^ bit_keys[low.bit_length() - 1]
+    return keys
+
+ROW_KEYS: tuple[list[int], ...] = tuple(_row_keys(row) for row in range(5))
+
+def row_content(first: int, second: int, row: int) -> int:
+    '''Index of the content of a row in ROW_KEYS'''
+    shift = row * 5
+    return ((first >> shift) & 31) | (((second >> shift) & 31) << 5)
+
+def full_hash(first: int, second: int) -> int:
+    '''Computes the packed hash of a position from scratch'''
+    packed = 0
+    for row in range(5):
+        packed ^= ROW_KEYS[row][row_content(first, second, row)]
+    return packed
+
+def fold(packed: int) -> tuple[int, int]:
+    '''
+    Folds the packed hash to the hash of the canonical orientation of the position.
+    Returns (canonical hash, symmetry that maps the position onto the canonical one)
+    '''
+    lanes = [(packed >> shift) & LANE_MASK for shift in _LANE_SHIFTS]
+    key = min(lanes)
+    return key, lanes.index(key)